@@ -0,0 +1,44 @@
+"""
+Helpers for sending stored files to clients.
+"""
+
+import mimetypes
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect
+from django.utils.http import content_disposition_header
+
+# Read size when Django streams a file itself; FileResponse defaults to 4 KiB
+DOWNLOAD_BLOCK_SIZE = 64 * 1024
+
+
+def download_response(field_file, filename: str) -> HttpResponse:
+    """
+    Return a response that delivers a stored file as an attachment.
+
+    With MEDIA_ACCEL_REDIRECT_PREFIX set, the response only names the file in
+    an X-Accel-Redirect header and nginx sends the bytes itself. Storage
+    without local paths (e.g. S3) redirects to the storage URL, so the file
+    is never proxied through Django. Otherwise the file is streamed.
+
+    Args:
+        field_file: FieldFile of the stored file
+        filename: Name the client should save the file as
+    """
+    prefix = settings.MEDIA_ACCEL_REDIRECT_PREFIX
+    if prefix:
+        content_type, _ = mimetypes.guess_type(filename)
+        response = HttpResponse(content_type=content_type or 'application/octet-stream')
+        response['X-Accel-Redirect'] = f'{prefix.rstrip("/")}/{quote(field_file.name)}'
+        response['Content-Disposition'] = content_disposition_header(True, filename)
+        return response
+
+    try:
+        field_file.storage.path(field_file.name)
+    except NotImplementedError:
+        return HttpResponseRedirect(field_file.storage.url(field_file.name))
+
+    response = FileResponse(field_file.open('rb'), as_attachment=True, filename=filename)
+    response.block_size = DOWNLOAD_BLOCK_SIZE
+    return response
@@ -0,0 +1,36 @@
+"""
+Tests for identifier helpers.
+"""
+
+import time
+import uuid
+
+from apps.core.ids import uuid7
+
+
+class TestUUID7:
+    """Tests for uuid7."""
+
+    def test_version_and_variant(self):
+        """Test ids are RFC 9562 version 7 UUIDs."""
+        value = uuid7()
+
+        assert value.version == 7
+        assert value.variant == uuid.RFC_4122
+
+    def test_embeds_current_time(self):
+        """Test the leading 48 bits hold the creation time in milliseconds."""
+        before = time.time_ns() // 1_000_000
+        value = uuid7()
+        after = time.time_ns() // 1_000_000
+
+        assert before <= value.int >> 80 <= after
+
+    def test_later_ids_sort_later(self):
+        """Test ids from different milliseconds sort by creation time."""
+        first = uuid7()
+        time.sleep(0.002)
+        second = uuid7()
+
+        assert first < second
+        assert str(first) < str(second)
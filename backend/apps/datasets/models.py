@@ -99,8 +99,7 @@ class Dataset(models.Model):
     def delete(self, *args, **kwargs):
         """Delete the file when the dataset is deleted."""
         if self.file:
-            if os.path.isfile(self.file.path):
-                os.remove(self.file.path)
+            self.file.delete(save=False)
         super().delete(*args, **kwargs)
 
     def compute_file_hash(self) -> str:
@@ -9,14 +9,19 @@ from apps.datasets.models import Dataset, DatasetColumn
 from apps.users.models import User
 
 
+pytestmark = pytest.mark.usefixtures('in_memory_storage')
+
+
+CSV_CONTENT = b'col1,col2\n1,2'
+
+
 @pytest.mark.django_db
 class TestDatasetModel:
     """Tests for the Dataset model."""
 
     def test_create_dataset(self, user):
         """Test creating a dataset."""
-        csv_content = b'col1,col2\n1,2\n3,4'
-        file = SimpleUploadedFile('test.csv', csv_content, content_type='text/csv')
+        file = SimpleUploadedFile('test.csv', CSV_CONTENT, content_type='text/csv')
 
         dataset = Dataset.objects.create(
             owner=user,
@@ -25,8 +30,8 @@ class TestDatasetModel:
             file=file,
             original_filename='test.csv',
             file_type='csv',
-            file_size=len(csv_content),
-            row_count=2,
+            file_size=len(CSV_CONTENT),
+            row_count=1,
             column_count=2,
         )
 
@@ -38,8 +43,7 @@ class TestDatasetModel:
 
     def test_dataset_has_uuid_pk(self, user):
         """Test that dataset has UUID primary key."""
-        csv_content = b'col1,col2\n1,2'
-        file = SimpleUploadedFile('test.csv', csv_content, content_type='text/csv')
+        file = SimpleUploadedFile('test.csv', CSV_CONTENT, content_type='text/csv')
 
         dataset = Dataset.objects.create(
             owner=user,
@@ -47,7 +51,7 @@ class TestDatasetModel:
             file=file,
             original_filename='test.csv',
             file_type='csv',
-            file_size=len(csv_content),
+            file_size=len(CSV_CONTENT),
         )
 
         # UUID should be 36 chars with hyphens
@@ -55,8 +59,7 @@ class TestDatasetModel:
 
     def test_dataset_status_choices(self, user):
         """Test dataset status choices."""
-        csv_content = b'col1,col2\n1,2'
-        file = SimpleUploadedFile('test.csv', csv_content, content_type='text/csv')
+        file = SimpleUploadedFile('test.csv', CSV_CONTENT, content_type='text/csv')
 
         dataset = Dataset.objects.create(
             owner=user,
@@ -64,7 +67,7 @@ class TestDatasetModel:
             file=file,
             original_filename='test.csv',
             file_type='csv',
-            file_size=len(csv_content),
+            file_size=len(CSV_CONTENT),
         )
 
         # Test all status values
@@ -76,8 +79,7 @@ class TestDatasetModel:
 
     def test_dataset_string_representation(self, user):
         """Test dataset string representation."""
-        csv_content = b'col1,col2\n1,2'
-        file = SimpleUploadedFile('test.csv', csv_content, content_type='text/csv')
+        file = SimpleUploadedFile('test.csv', CSV_CONTENT, content_type='text/csv')
 
         dataset = Dataset.objects.create(
             owner=user,
@@ -85,15 +87,14 @@ class TestDatasetModel:
             file=file,
             original_filename='test.csv',
             file_type='csv',
-            file_size=len(csv_content),
+            file_size=len(CSV_CONTENT),
         )
 
         assert 'My Dataset' in str(dataset)
 
     def test_dataset_timestamps(self, user):
         """Test that dataset has created_at and updated_at."""
-        csv_content = b'col1,col2\n1,2'
-        file = SimpleUploadedFile('test.csv', csv_content, content_type='text/csv')
+        file = SimpleUploadedFile('test.csv', CSV_CONTENT, content_type='text/csv')
 
         dataset = Dataset.objects.create(
             owner=user,
@@ -101,7 +102,7 @@ class TestDatasetModel:
             file=file,
             original_filename='test.csv',
             file_type='csv',
-            file_size=len(csv_content),
+            file_size=len(CSV_CONTENT),
         )
 
         assert dataset.created_at is not None
@@ -109,17 +110,16 @@ class TestDatasetModel:
 
     def test_dataset_ordering(self, user):
         """Test that datasets are ordered by created_at descending."""
-        csv_content = b'col1,col2\n1,2'
 
         for i in range(3):
-            file = SimpleUploadedFile(f'test{i}.csv', csv_content, content_type='text/csv')
+            file = SimpleUploadedFile(f'test{i}.csv', CSV_CONTENT, content_type='text/csv')
             Dataset.objects.create(
                 owner=user,
                 name=f'Dataset {i}',
                 file=file,
                 original_filename=f'test{i}.csv',
                 file_type='csv',
-                file_size=len(csv_content),
+                file_size=len(CSV_CONTENT),
             )
 
         datasets = list(Dataset.objects.filter(owner=user))
@@ -129,8 +129,7 @@ class TestDatasetModel:
 
     def test_dataset_file_size_display(self, user):
         """Test file_size_display property."""
-        csv_content = b'col1,col2\n1,2'
-        file = SimpleUploadedFile('test.csv', csv_content, content_type='text/csv')
+        file = SimpleUploadedFile('test.csv', CSV_CONTENT, content_type='text/csv')
 
         # Small file (bytes)
         dataset = Dataset.objects.create(
@@ -155,8 +154,7 @@ class TestDatasetModel:
 
     def test_dataset_schema_json(self, user):
         """Test that schema is stored as JSON."""
-        csv_content = b'col1,col2\n1,2'
-        file = SimpleUploadedFile('test.csv', csv_content, content_type='text/csv')
+        file = SimpleUploadedFile('test.csv', CSV_CONTENT, content_type='text/csv')
 
         schema = {
             'col1': {'dtype': 'numeric', 'nullable': False},
@@ -169,7 +167,7 @@ class TestDatasetModel:
             file=file,
             original_filename='test.csv',
             file_type='csv',
-            file_size=len(csv_content),
+            file_size=len(CSV_CONTENT),
             schema=schema,
         )
 
@@ -179,8 +177,7 @@ class TestDatasetModel:
 
     def test_dataset_cascade_delete(self, user):
         """Test that deleting user deletes their datasets."""
-        csv_content = b'col1,col2\n1,2'
-        file = SimpleUploadedFile('test.csv', csv_content, content_type='text/csv')
+        file = SimpleUploadedFile('test.csv', CSV_CONTENT, content_type='text/csv')
 
         dataset = Dataset.objects.create(
             owner=user,
@@ -188,7 +185,7 @@ class TestDatasetModel:
             file=file,
             original_filename='test.csv',
             file_type='csv',
-            file_size=len(csv_content),
+            file_size=len(CSV_CONTENT),
         )
         dataset_id = dataset.id
 
@@ -196,6 +193,25 @@ class TestDatasetModel:
 
         assert not Dataset.objects.filter(id=dataset_id).exists()
 
+    def test_delete_removes_file(self, user):
+        """Test that deleting a dataset removes its file from storage."""
+        file = SimpleUploadedFile('test.csv', CSV_CONTENT, content_type='text/csv')
+
+        dataset = Dataset.objects.create(
+            owner=user,
+            name='Test',
+            file=file,
+            original_filename='test.csv',
+            file_type='csv',
+            file_size=len(CSV_CONTENT),
+        )
+        storage, name = dataset.file.storage, dataset.file.name
+        assert storage.exists(name)
+
+        dataset.delete()
+
+        assert not storage.exists(name)
+
 
 @pytest.mark.django_db
 class TestDatasetColumnModel:
@@ -203,8 +219,7 @@ class TestDatasetColumnModel:
 
     def test_create_dataset_column(self, user):
         """Test creating a dataset column."""
-        csv_content = b'col1,col2\n1,2'
-        file = SimpleUploadedFile('test.csv', csv_content, content_type='text/csv')
+        file = SimpleUploadedFile('test.csv', CSV_CONTENT, content_type='text/csv')
 
         dataset = Dataset.objects.create(
             owner=user,
@@ -212,7 +227,7 @@ class TestDatasetColumnModel:
             file=file,
             original_filename='test.csv',
             file_type='csv',
-            file_size=len(csv_content),
+            file_size=len(CSV_CONTENT),
         )
 
         column = DatasetColumn.objects.create(
@@ -260,8 +275,7 @@ class TestDatasetColumnModel:
 
     def test_dataset_column_string_representation(self, user):
         """Test column string representation."""
-        csv_content = b'col1,col2\n1,2'
-        file = SimpleUploadedFile('test.csv', csv_content, content_type='text/csv')
+        file = SimpleUploadedFile('test.csv', CSV_CONTENT, content_type='text/csv')
 
         dataset = Dataset.objects.create(
             owner=user,
@@ -269,7 +283,7 @@ class TestDatasetColumnModel:
             file=file,
             original_filename='test.csv',
             file_type='csv',
-            file_size=len(csv_content),
+            file_size=len(CSV_CONTENT),
         )
 
         column = DatasetColumn.objects.create(
@@ -284,8 +298,7 @@ class TestDatasetColumnModel:
 
     def test_dataset_column_cascade_delete(self, user):
         """Test that deleting dataset deletes its columns."""
-        csv_content = b'col1,col2\n1,2'
-        file = SimpleUploadedFile('test.csv', csv_content, content_type='text/csv')
+        file = SimpleUploadedFile('test.csv', CSV_CONTENT, content_type='text/csv')
 
         dataset = Dataset.objects.create(
             owner=user,
@@ -293,7 +306,7 @@ class TestDatasetColumnModel:
             file=file,
             original_filename='test.csv',
             file_type='csv',
-            file_size=len(csv_content),
+            file_size=len(CSV_CONTENT),
         )
 
         column = DatasetColumn.objects.create(
@@ -311,8 +324,7 @@ class TestDatasetColumnModel:
 
     def test_dataset_column_null_statistics(self, user):
         """Test column null statistics fields."""
-        csv_content = b'col1,col2\n1,2'
-        file = SimpleUploadedFile('test.csv', csv_content, content_type='text/csv')
+        file = SimpleUploadedFile('test.csv', CSV_CONTENT, content_type='text/csv')
 
         dataset = Dataset.objects.create(
             owner=user,
@@ -320,7 +332,7 @@ class TestDatasetColumnModel:
             file=file,
             original_filename='test.csv',
             file_type='csv',
-            file_size=len(csv_content),
+            file_size=len(CSV_CONTENT),
         )
 
         column = DatasetColumn.objects.create(
@@ -5,7 +5,6 @@ Views for the datasets app.
 import logging
 import os
 
-from django.http import FileResponse
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import action
 from rest_framework.parsers import FormParser, MultiPartParser
@@ -14,6 +13,7 @@ from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
 
 from apps.core.exceptions import DatasetNotFoundError, FileUploadError
+from apps.core.files import download_response
 
 from .models import Dataset
 from .serializers import (
@@ -199,12 +199,7 @@ class DatasetViewSet(ModelViewSet):
             )
 
         try:
-            response = FileResponse(
-                dataset.file.open('rb'),
-                as_attachment=True,
-                filename=dataset.original_filename
-            )
-            return response
+            return download_response(dataset.file, dataset.original_filename)
 
         except Exception as e:
             logger.error(f'Failed to download dataset {dataset.id}: {str(e)}')
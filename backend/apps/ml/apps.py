@@ -5,3 +5,6 @@ class MlConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.ml'
     verbose_name = 'Machine Learning'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,134 @@
+"""
+Candidate model fitting.
+
+Runs inside worker processes, so this module deliberately imports nothing
+from Django: workers unpickle these functions without an app registry.
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+from joblib import Memory
+from scipy import sparse
+from sklearn.base import clone
+from sklearn.model_selection import KFold, cross_val_score
+
+logger = logging.getLogger(__name__)
+
+CLASSIFICATION = 'classification'
+
+
+def to_dense(X):
+    """Convert a sparse matrix to a dense array; dense input passes through."""
+    return X.toarray() if sparse.issparse(X) else X
+
+
+def to_float32(X):
+    """Cast a feature matrix to float32 without copying when already float32."""
+    return X.astype(np.float32, copy=False)
+
+
+def fit_transform_splits(preprocessor, X_train: pd.DataFrame, X_test: pd.DataFrame):
+    """
+    Fit a preprocessor on the training split and transform both splits.
+
+    Args:
+        preprocessor: Unfitted preprocessor (cloned before fitting)
+        X_train: Training features
+        X_test: Test features
+
+    Returns:
+        Tuple of (fitted preprocessor, X_train_t, X_test_t)
+    """
+    fitted = clone(preprocessor).fit(X_train)
+    return fitted, fitted.transform(X_train), fitted.transform(X_test)
+
+
+def fit_candidate(
+    name: str,
+    config: dict,
+    X_train_t: np.ndarray | sparse.spmatrix,
+    y_train: pd.Series,
+    X_cv_t: np.ndarray | sparse.spmatrix,
+    y_cv: pd.Series,
+    task_type: str,
+    memory: Memory | None = None
+) -> dict:
+    """
+    Fit and cross-validate a single candidate model.
+
+    Both the fit and cross-validation run on already-preprocessed matrices,
+    so the preprocessor is never refit per fold. This accepts the small
+    optimism of scaling/encoding statistics seen across folds.
+
+    Args:
+        name: Candidate model name
+        config: Candidate config with 'class', 'params' and optionally
+            'dense_input' for estimators that are slow on sparse input
+        X_train_t: Preprocessed training features
+        y_train: Training target
+        X_cv_t: Preprocessed features for cross-validation
+        y_cv: Target for cross-validation
+        task_type: 'classification' or 'regression'
+        memory: Cache for CV scores, keyed on estimator params and data
+
+    Returns:
+        Dictionary with the fitted 'model' and the finite 'cv_scores', or
+        'error' if fitting or every cross-validation fold failed
+    """
+    try:
+        if config.get('dense_input'):
+            X_train_t, X_cv_t = to_dense(X_train_t), to_dense(X_cv_t)
+
+        model = config['class'](**config['params'])
+        cross_validate = memory.cache(cross_validate_candidate) if memory else cross_validate_candidate
+        cv_scores = cross_validate(clone(model), X_cv_t, y_cv, task_type)
+        model.fit(X_train_t, y_train)
+    except Exception as e:
+        return {'name': name, 'error': str(e)}
+
+    # Folds that failed to fit score NaN, which JSON columns reject
+    finite_scores = [float(s) for s in cv_scores if np.isfinite(s)]
+    if not finite_scores:
+        return {'name': name, 'error': 'All cross-validation folds failed'}
+    if len(finite_scores) < len(cv_scores):
+        logger.warning(
+            f'{len(cv_scores) - len(finite_scores)} of {len(cv_scores)} '
+            f'cross-validation folds failed for {name}'
+        )
+
+    return {
+        'name': name,
+        'model': model,
+        'cv_scores': finite_scores,
+    }
+
+
+def cross_validate_candidate(estimator, X_full, y_full, task_type: str):
+    """Cross-validate with adaptive folds for small datasets."""
+    if task_type == CLASSIFICATION:
+        # Ensure each class has enough samples per fold
+        min_class_count = y_full.value_counts().min()
+        n_folds = min(5, max(2, min_class_count))
+        scoring = 'f1_weighted'
+    else:
+        # For regression, base on total sample count
+        n_folds = min(5, max(2, len(y_full) // 5))
+        scoring = 'neg_root_mean_squared_error'
+
+    # Folds fit in parallel; inside a pool worker joblib caps this to the
+    # worker's share of cores
+    parallel_params = {'n_jobs': -1, 'pre_dispatch': '2*n_jobs'}
+
+    try:
+        return cross_val_score(
+            estimator, X_full, y_full, cv=n_folds, scoring=scoring, **parallel_params
+        )
+    except ValueError as e:
+        # Fallback: use simple KFold if stratified fails (e.g., too many classes)
+        logger.warning(f'Stratified CV failed, using KFold: {e}')
+        kfold = KFold(n_splits=min(5, max(2, len(y_full) // 5)), shuffle=True, random_state=42)
+        return cross_val_score(
+            estimator, X_full, y_full, cv=kfold, scoring=scoring, **parallel_params
+        )
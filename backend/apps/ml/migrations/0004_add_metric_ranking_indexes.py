@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-15 22:40
+
+import django.db.models.fields.json
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ml", "0003_add_shap_values_field"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="trainedmodel",
+            index=models.Index(
+                models.F("training_job"),
+                django.db.models.functions.comparison.Cast(
+                    django.db.models.fields.json.KeyTextTransform(
+                        "f1_weighted", "metrics"
+                    ),
+                    models.FloatField(),
+                ),
+                name="trained_models_f1_weighted_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="trainedmodel",
+            index=models.Index(
+                models.F("training_job"),
+                django.db.models.functions.comparison.Cast(
+                    django.db.models.fields.json.KeyTextTransform("rmse", "metrics"),
+                    models.FloatField(),
+                ),
+                name="trained_models_rmse_idx",
+            ),
+        ),
+    ]
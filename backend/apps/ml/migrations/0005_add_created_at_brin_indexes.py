@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-15 22:47
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ml", "0004_add_metric_ranking_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="trainedmodel",
+            index=django.contrib.postgres.indexes.BrinIndex(
+                fields=["created_at"],
+                name="trained_models_created_brin",
+                pages_per_range=32,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="trainingjob",
+            index=django.contrib.postgres.indexes.BrinIndex(
+                fields=["created_at"],
+                name="training_jobs_created_brin",
+                pages_per_range=32,
+            ),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-15 22:48
+
+import apps.ml.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ml", "0005_add_created_at_brin_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="trainedmodel",
+            name="preprocessing_params_file",
+            field=models.FileField(
+                blank=True,
+                null=True,
+                upload_to=apps.ml.models.preprocessing_params_upload_path,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="trainedmodel",
+            name="preprocessing_params",
+            field=models.JSONField(
+                default=dict,
+                help_text="Preprocessing configuration (encoders, scalers), or a reference to preprocessing_params_file when large",
+            ),
+        ),
+    ]
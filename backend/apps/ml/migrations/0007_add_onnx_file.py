@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-15 23:12
+
+import apps.ml.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ml", "0006_add_preprocessing_params_file"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="trainedmodel",
+            name="onnx_file",
+            field=models.FileField(
+                blank=True,
+                help_text="ONNX export of the final estimator, used for serving when available",
+                null=True,
+                upload_to=apps.ml.models.onnx_upload_path,
+            ),
+        ),
+    ]
@@ -2,11 +2,16 @@
 Models for Machine Learning training and model management.
 """
 
-import os
+import hashlib
+import json
 import uuid
 
 from django.conf import settings
+from django.core.files.base import ContentFile
+from django.contrib.postgres.indexes import BrinIndex
 from django.db import models
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Cast
 
 from apps.datasets.models import Dataset
 
@@ -16,6 +21,16 @@ def model_upload_path(instance, filename):
     return f'models/{instance.owner.id}/{instance.id}.joblib'
 
 
+def preprocessing_params_upload_path(instance, filename):
+    """Generate upload path for offloaded preprocessing params."""
+    return f'models/{instance.owner.id}/{instance.id}.params.json'
+
+
+def onnx_upload_path(instance, filename):
+    """Generate upload path for ONNX exports of trained models."""
+    return f'models/{instance.owner.id}/{instance.id}.onnx'
+
+
 class TrainingJob(models.Model):
     """
     ML training job metadata.
@@ -106,6 +121,12 @@ class TrainingJob(models.Model):
             models.Index(fields=['owner', '-created_at']),
             models.Index(fields=['status']),
             models.Index(fields=['dataset']),
+            # Compact range index for cross-owner recent listings
+            BrinIndex(
+                fields=['created_at'],
+                name='training_jobs_created_brin',
+                pages_per_range=32,
+            ),
         ]
 
     def __str__(self):
@@ -134,6 +155,9 @@ class TrainedModel(models.Model):
         GRADIENT_BOOSTING = 'gradient_boosting', 'Gradient Boosting'
         SVM = 'svm', 'Support Vector Machine'
 
+    # Serialized params above this size are moved to preprocessing_params_file
+    PREPROCESSING_PARAMS_INLINE_LIMIT = 8 * 1024
+
     id = models.UUIDField(
         primary_key=True,
         default=uuid.uuid4,
@@ -179,7 +203,13 @@ class TrainedModel(models.Model):
     )
     preprocessing_params = models.JSONField(
         default=dict,
-        help_text='Preprocessing configuration (encoders, scalers)'
+        help_text='Preprocessing configuration (encoders, scalers), or a '
+                  'reference to preprocessing_params_file when large'
+    )
+    preprocessing_params_file = models.FileField(
+        upload_to=preprocessing_params_upload_path,
+        null=True,
+        blank=True
     )
 
     # Metrics
@@ -218,6 +248,12 @@ class TrainedModel(models.Model):
         blank=True,
         help_text='Model file size in bytes'
     )
+    onnx_file = models.FileField(
+        upload_to=onnx_upload_path,
+        null=True,
+        blank=True,
+        help_text='ONNX export of the final estimator, used for serving when available'
+    )
 
     # Selection
     is_best = models.BooleanField(
@@ -235,11 +271,69 @@ class TrainedModel(models.Model):
             models.Index(fields=['owner', '-created_at']),
             models.Index(fields=['training_job']),
             models.Index(fields=['is_best']),
+            BrinIndex(
+                fields=['created_at'],
+                name='trained_models_created_brin',
+                pages_per_range=32,
+            ),
+            # Expression indexes backing the per-job metric ranking
+            models.Index(
+                models.F('training_job'),
+                Cast(KeyTextTransform('f1_weighted', 'metrics'), models.FloatField()),
+                name='trained_models_f1_weighted_idx',
+            ),
+            models.Index(
+                models.F('training_job'),
+                Cast(KeyTextTransform('rmse', 'metrics'), models.FloatField()),
+                name='trained_models_rmse_idx',
+            ),
         ]
 
     def __str__(self):
         return f'{self.display_name} ({self.dataset.name})'
 
+    def set_preprocessing_params(self, params: dict) -> None:
+        """
+        Store preprocessing params inline, or offload them to storage if large.
+
+        Large params (e.g. long one-hot category lists) are written to
+        preprocessing_params_file and the column keeps only a reference and
+        digest, so row fetches stay small. The row itself is not saved.
+
+        Args:
+            params: Preprocessing configuration to store
+        """
+        content = json.dumps(params, sort_keys=True, separators=(',', ':')).encode()
+        if len(content) <= self.PREPROCESSING_PARAMS_INLINE_LIMIT:
+            self.preprocessing_params = params
+            return
+
+        self.preprocessing_params_file.save(
+            'params.json', ContentFile(content), save=False
+        )
+        self.preprocessing_params = {
+            '__ref__': self.preprocessing_params_file.name,
+            'sha256': hashlib.sha256(content).hexdigest(),
+        }
+        self._resolved_preprocessing_params = params
+
+    @property
+    def resolved_preprocessing_params(self) -> dict:
+        """Return preprocessing params, loading them from storage if offloaded."""
+        params = self.preprocessing_params
+        if not isinstance(params, dict) or '__ref__' not in params:
+            return params
+
+        if getattr(self, '_resolved_preprocessing_params', None) is None:
+            with self.preprocessing_params_file.open('rb') as f:
+                content = f.read()
+            if hashlib.sha256(content).hexdigest() != params.get('sha256'):
+                raise ValueError(
+                    f'Preprocessing params file for model {self.id} failed integrity check'
+                )
+            self._resolved_preprocessing_params = json.loads(content)
+        return self._resolved_preprocessing_params
+
     @property
     def primary_metric(self):
         """Get the primary metric value based on task type."""
@@ -260,10 +354,3 @@ class TrainedModel(models.Model):
                 return f'{size:.1f} {unit}'
             size /= 1024
         return f'{size:.1f} TB'
-
-    def delete(self, *args, **kwargs):
-        """Delete the model file when the record is deleted."""
-        if self.model_file:
-            if os.path.isfile(self.model_file.path):
-                os.remove(self.model_file.path)
-        super().delete(*args, **kwargs)
@@ -70,6 +70,9 @@ class TrainedModelDetailSerializer(serializers.ModelSerializer):
     primary_metric = serializers.ReadOnlyField()
     has_shap = serializers.SerializerMethodField()
     training_job_duration = serializers.SerializerMethodField()
+    preprocessing_params = serializers.JSONField(
+        source='resolved_preprocessing_params', read_only=True
+    )
 
     class Meta:
         model = TrainedModel
@@ -4,25 +4,26 @@ Model Evaluator Service.
 Handles model evaluation and metrics computation.
 """
 
+import heapq
 import logging
 from typing import Any
 
 import numpy as np
 import pandas as pd
+from django.db.models import Case, F, FloatField, Value, When, Window
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Cast, RowNumber
 from sklearn.metrics import (
-    accuracy_score,
     confusion_matrix,
-    f1_score,
     mean_absolute_error,
     mean_squared_error,
-    precision_score,
+    precision_recall_fscore_support,
     r2_score,
-    recall_score,
     roc_auc_score,
     roc_curve,
 )
 
-from apps.ml.models import TrainingJob
+from apps.ml.models import TrainedModel, TrainingJob
 
 logger = logging.getLogger(__name__)
 
@@ -34,13 +35,19 @@ class ModelEvaluatorService:
     Computes appropriate metrics based on task type.
     """
 
+    # Maximum number of points kept on the ROC curve sent to the frontend
+    ROC_MAX_POINTS = 200
+    # Points closer than this to the simplified curve are dropped
+    ROC_TOLERANCE = 1e-3
+
     def evaluate(
         self,
         y_true: np.ndarray,
         y_pred: np.ndarray,
         task_type: str,
         pipeline=None,
-        X_test: pd.DataFrame = None
+        X_test: pd.DataFrame = None,
+        y_proba: np.ndarray | None = None
     ) -> dict[str, Any]:
         """
         Evaluate model predictions.
@@ -49,14 +56,16 @@ class ModelEvaluatorService:
             y_true: True target values
             y_pred: Predicted values
             task_type: 'classification' or 'regression'
-            pipeline: Trained pipeline (for probability predictions)
+            pipeline: Trained pipeline or estimator (for probability predictions)
             X_test: Test features (required for ROC curve computation)
+            y_proba: Precomputed class probabilities; when given, the
+                pipeline is not asked for them again
 
         Returns:
             Dictionary of metrics
         """
         if task_type == TrainingJob.TaskType.CLASSIFICATION:
-            return self._evaluate_classification(y_true, y_pred, pipeline, X_test)
+            return self._evaluate_classification(y_true, y_pred, pipeline, X_test, y_proba)
         else:
             return self._evaluate_regression(y_true, y_pred)
 
@@ -65,15 +74,13 @@ class ModelEvaluatorService:
         y_true: np.ndarray,
         y_pred: np.ndarray,
         pipeline=None,
-        X_test: pd.DataFrame = None
+        X_test: pd.DataFrame = None,
+        y_proba: np.ndarray | None = None
     ) -> dict[str, Any]:
         """Compute classification metrics."""
         metrics = {}
 
         try:
-            # Basic metrics
-            metrics['accuracy'] = float(accuracy_score(y_true, y_pred))
-
             # Determine averaging strategy based on number of classes
             unique_classes = np.unique(y_true)
             is_binary = len(unique_classes) == 2
@@ -85,62 +92,68 @@ class ModelEvaluatorService:
                 average = 'weighted'
                 pos_label = None
 
-            # Precision, Recall, F1
-            metrics['precision'] = float(precision_score(
-                y_true, y_pred, average=average, pos_label=pos_label, zero_division=0
-            ))
-            metrics['recall'] = float(recall_score(
-                y_true, y_pred, average=average, pos_label=pos_label, zero_division=0
-            ))
-            metrics['f1'] = float(f1_score(
+            # Confusion matrix (accuracy is read off its diagonal)
+            cm = confusion_matrix(y_true, y_pred)
+            metrics['accuracy'] = float(np.trace(cm) / cm.sum())
+
+            # Precision, Recall, F1 from a single pass over the labels
+            precision, recall, f1, _ = precision_recall_fscore_support(
                 y_true, y_pred, average=average, pos_label=pos_label, zero_division=0
-            ))
+            )
+            metrics['precision'] = float(precision)
+            metrics['recall'] = float(recall)
+            metrics['f1'] = float(f1)
 
             # Weighted F1 for multi-class
-            metrics['f1_weighted'] = float(f1_score(
-                y_true, y_pred, average='weighted', zero_division=0
-            ))
+            if average == 'weighted':
+                metrics['f1_weighted'] = metrics['f1']
+            else:
+                _, _, f1_weighted, _ = precision_recall_fscore_support(
+                    y_true, y_pred, average='weighted', zero_division=0
+                )
+                metrics['f1_weighted'] = float(f1_weighted)
 
             # Confusion matrix with labels
-            cm = confusion_matrix(y_true, y_pred)
             metrics['confusion_matrix'] = cm.tolist()
             metrics['confusion_matrix_labels'] = [str(c) for c in unique_classes]
 
             # ROC-AUC and ROC curve for binary classification
-            if is_binary and pipeline is not None and X_test is not None:
+            if is_binary:
                 try:
-                    model = pipeline.named_steps.get('model')
-                    if hasattr(model, 'predict_proba'):
-                        # Get probability predictions using X_test
-                        y_proba = pipeline.predict_proba(X_test)
-                        if y_proba.shape[1] == 2:
-                            # Get probabilities for positive class
-                            y_proba_positive = y_proba[:, 1]
-
-                            # Compute ROC-AUC score
-                            metrics['roc_auc'] = float(roc_auc_score(y_true, y_proba_positive))
-
-                            # Compute full ROC curve data for visualization
-                            fpr, tpr, thresholds = roc_curve(y_true, y_proba_positive)
-
-                            # Limit data points if too many (for frontend performance)
-                            max_points = 200
-                            if len(fpr) > max_points:
-                                # Sample evenly spaced indices
-                                indices = np.linspace(0, len(fpr) - 1, max_points, dtype=int)
-                                fpr = fpr[indices]
-                                tpr = tpr[indices]
-                                thresholds = thresholds[indices]
-
-                            # Filter out infinite thresholds and convert to list
-                            metrics['roc_curve'] = {
-                                'fpr': [float(x) for x in fpr],
-                                'tpr': [float(x) for x in tpr],
-                                'thresholds': [
-                                    float(x) if not np.isinf(x) else None
-                                    for x in thresholds
-                                ]
-                            }
+                    if y_proba is None and pipeline is not None and X_test is not None:
+                        # Accept a full pipeline or a bare fitted estimator
+                        model = getattr(pipeline, 'named_steps', {}).get('model', pipeline)
+                        if hasattr(model, 'predict_proba'):
+                            y_proba = pipeline.predict_proba(X_test)
+                    if y_proba is not None and y_proba.shape[1] == 2:
+                        # Get probabilities for positive class
+                        y_proba_positive = y_proba[:, 1]
+
+                        # Compute ROC-AUC score
+                        metrics['roc_auc'] = float(roc_auc_score(y_true, y_proba_positive))
+
+                        # Compute full ROC curve data for visualization
+                        fpr, tpr, thresholds = roc_curve(y_true, y_proba_positive)
+
+                        # Limit data points if too many (for frontend performance)
+                        if len(fpr) > self.ROC_MAX_POINTS:
+                            # Keep the points that define the curve's shape
+                            indices = self._simplify_curve(
+                                fpr, tpr, self.ROC_MAX_POINTS, self.ROC_TOLERANCE
+                            )
+                            fpr = fpr[indices]
+                            tpr = tpr[indices]
+                            thresholds = thresholds[indices]
+
+                        # Null out infinite thresholds (sklearn prepends +inf)
+                        thresholds_out = thresholds.astype(object)
+                        thresholds_out[np.isinf(thresholds)] = None
+
+                        metrics['roc_curve'] = {
+                            'fpr': fpr.tolist(),
+                            'tpr': tpr.tolist(),
+                            'thresholds': thresholds_out.tolist(),
+                        }
                 except Exception as e:
                     logger.warning(f'Failed to compute ROC-AUC: {e}')
 
@@ -150,6 +163,60 @@ class ModelEvaluatorService:
 
         return metrics
 
+    @staticmethod
+    def _simplify_curve(
+        x: np.ndarray,
+        y: np.ndarray,
+        max_points: int,
+        tolerance: float = 0.0
+    ) -> np.ndarray:
+        """
+        Simplify a polyline with Ramer-Douglas-Peucker, capped at max_points.
+
+        Segments are split in order of their largest deviation, so when the
+        cap is hit the points that matter most for the shape are kept.
+
+        Args:
+            x: X coordinates of the curve
+            y: Y coordinates of the curve
+            max_points: Maximum number of points to keep (at least 2)
+            tolerance: Stop splitting segments whose deviation is at most this
+
+        Returns:
+            Sorted indices of the points to keep
+        """
+        n = len(x)
+        if n <= 2 or max_points <= 2:
+            return np.array([0, n - 1]) if n > 1 else np.arange(n)
+
+        def farthest(start: int, end: int) -> tuple[float, int]:
+            if end - start < 2:
+                return 0.0, -1
+            dx, dy = x[end] - x[start], y[end] - y[start]
+            px, py = x[start + 1:end] - x[start], y[start + 1:end] - y[start]
+            norm = np.hypot(dx, dy)
+            if norm == 0:
+                dist = np.hypot(px, py)
+            else:
+                dist = np.abs(dx * py - dy * px) / norm
+            i = int(np.argmax(dist))
+            return float(dist[i]), start + 1 + i
+
+        keep = [0, n - 1]
+        dist, split = farthest(0, n - 1)
+        heap = [(-dist, 0, n - 1, split)]
+        while heap and len(keep) < max_points:
+            neg_dist, start, end, split = heapq.heappop(heap)
+            if -neg_dist <= tolerance:
+                break
+            keep.append(split)
+            for lo, hi in ((start, split), (split, end)):
+                dist, idx = farthest(lo, hi)
+                if idx >= 0:
+                    heapq.heappush(heap, (-dist, lo, hi, idx))
+
+        return np.sort(np.array(keep))
+
     def _evaluate_regression(
         self,
         y_true: np.ndarray,
@@ -196,14 +263,7 @@ class ModelEvaluatorService:
         Returns:
             Sorted list of models with rankings
         """
-        if task_type == TrainingJob.TaskType.CLASSIFICATION:
-            # Sort by F1 (descending)
-            key_metric = 'f1_weighted'
-            reverse = True
-        else:
-            # Sort by RMSE (ascending)
-            key_metric = 'rmse'
-            reverse = False
+        key_metric, reverse = self._ranking_metric(task_type)
 
         sorted_models = sorted(
             models,
@@ -217,3 +277,52 @@ class ModelEvaluatorService:
             model['is_best'] = (i == 0)
 
         return sorted_models
+
+    def rank_trained_models(self, training_job: TrainingJob) -> list[dict]:
+        """
+        Rank the persisted models of a training job and flag the best one.
+
+        The primary metric is extracted from the ``metrics`` JSON and ranked
+        with a window function, so sorting happens in the database instead
+        of pulling every metrics blob into Python.
+
+        Args:
+            training_job: TrainingJob whose models should be ranked
+
+        Returns:
+            List of dicts with 'id', 'name', 'primary', 'rank' and 'is_best',
+            ordered by rank
+        """
+        key_metric, reverse = self._ranking_metric(training_job.task_type)
+
+        primary = F('primary').desc(nulls_last=True) if reverse else F('primary').asc(nulls_last=True)
+        ranked = list(
+            TrainedModel.objects.filter(training_job=training_job)
+            .annotate(primary=Cast(KeyTextTransform(key_metric, 'metrics'), FloatField()))
+            .annotate(rank=Window(
+                expression=RowNumber(),
+                order_by=[primary, F('created_at').asc()],
+            ))
+            .order_by('rank')
+            .values('id', 'name', 'primary', 'rank')
+        )
+        if not ranked:
+            return []
+
+        best_id = ranked[0]['id']
+        TrainedModel.objects.filter(training_job=training_job).update(
+            is_best=Case(When(pk=best_id, then=Value(True)), default=Value(False))
+        )
+
+        for model in ranked:
+            model['is_best'] = model['id'] == best_id
+
+        return ranked
+
+    def _ranking_metric(self, task_type: str) -> tuple[str, bool]:
+        """Return the ranking metric key and whether higher is better."""
+        if task_type == TrainingJob.TaskType.CLASSIFICATION:
+            # Sort by F1 (descending)
+            return 'f1_weighted', True
+        # Sort by RMSE (ascending)
+        return 'rmse', False
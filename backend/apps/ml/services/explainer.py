@@ -4,17 +4,46 @@ SHAP Explainer Service.
 Computes SHAP values for model explainability.
 """
 
+import hashlib
 import logging
+import weakref
+from collections import OrderedDict
 from typing import Any
 
 import numpy as np
 import pandas as pd
 import shap
+from scipy import sparse
 
 from apps.core.exceptions import TrainingError
 
 logger = logging.getLogger(__name__)
 
+# Transformed samples per fitted preprocessor, keyed by a digest of the input
+# rows. The trainer explains every candidate model on the same rows with the
+# same preprocessor, so only the first candidate pays for the transform.
+_TRANSFORM_CACHE_SIZE = 16
+_transform_cache: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def _transform_cached(preprocessor, X: pd.DataFrame):
+    """Transform X with a fitted preprocessor, reusing a previous result."""
+    digest = hashlib.blake2b(
+        pd.util.hash_pandas_object(X, index=True).values.tobytes(),
+        digest_size=16
+    ).hexdigest()
+
+    entries = _transform_cache.setdefault(preprocessor, OrderedDict())
+    if digest in entries:
+        entries.move_to_end(digest)
+        return entries[digest]
+
+    transformed = preprocessor.transform(X)
+    entries[digest] = transformed
+    if len(entries) > _TRANSFORM_CACHE_SIZE:
+        entries.popitem(last=False)
+    return transformed
+
 
 class SHAPExplainerService:
     """
@@ -22,7 +51,7 @@ class SHAPExplainerService:
 
     Selects appropriate explainer based on model type:
     - TreeExplainer: Random Forest, Gradient Boosting
-    - LinearExplainer: Logistic/Linear Regression
+    - Closed-form linear SHAP: Logistic/Linear Regression
     - KernelExplainer: SVM and other models (fallback, slower)
     """
 
@@ -30,11 +59,22 @@ class SHAPExplainerService:
     MAX_BACKGROUND_SAMPLES = 100
     MAX_EXPLAIN_SAMPLES = 200
 
+    # KernelExplainer settings (model-agnostic, so kept small)
+    MAX_KERNEL_EXPLAIN_SAMPLES = 50
+    KERNEL_BACKGROUND_CLUSTERS = 10
+    KERNEL_NSAMPLES = 100
+
     # Model types that support specific explainers
     TREE_MODELS = ['random_forest', 'gradient_boosting']
     LINEAR_MODELS = ['logistic_regression', 'linear_regression']
 
-    def __init__(self, pipeline, algorithm_type: str, feature_columns: list):
+    def __init__(
+        self,
+        pipeline,
+        algorithm_type: str,
+        feature_columns: list,
+        feature_names: list | None = None
+    ):
         """
         Initialize the explainer.
 
@@ -42,10 +82,12 @@ class SHAPExplainerService:
             pipeline: Trained sklearn pipeline with preprocessor and model
             algorithm_type: Type of algorithm (e.g., 'random_forest', 'svm')
             feature_columns: List of original feature column names
+            feature_names: Feature names after preprocessing, if already known
         """
         self.pipeline = pipeline
         self.algorithm_type = algorithm_type
         self.feature_columns = feature_columns
+        self.feature_names = feature_names
         self.preprocessor = pipeline.named_steps['preprocessor']
         self.model = pipeline.named_steps['model']
 
@@ -63,32 +105,28 @@ class SHAPExplainerService:
             Dictionary with SHAP summary data
         """
         try:
-            # Sample if too large
-            if len(X_data) > self.MAX_BACKGROUND_SAMPLES:
-                X_background = X_data.sample(
-                    n=self.MAX_BACKGROUND_SAMPLES,
-                    random_state=42
-                )
-            else:
-                X_background = X_data
-
-            if len(X_data) > self.MAX_EXPLAIN_SAMPLES:
-                X_explain = X_data.sample(
-                    n=self.MAX_EXPLAIN_SAMPLES,
-                    random_state=42
-                )
-            else:
-                X_explain = X_data
+            # Draw one permutation and share it: the background set is a
+            # prefix of the explain set, so rows are transformed only once
+            rng = np.random.default_rng(42)
+            idx = rng.permutation(len(X_data))
+            n_rows = max(self.MAX_BACKGROUND_SAMPLES, self.MAX_EXPLAIN_SAMPLES)
+            X_sampled = X_data.iloc[idx[:n_rows]]
 
             # Transform data through preprocessor
-            X_background_transformed = self.preprocessor.transform(X_background)
-            X_explain_transformed = self.preprocessor.transform(X_explain)
+            X_transformed = _transform_cached(self.preprocessor, X_sampled)
+            if sparse.issparse(X_transformed):
+                # At most a few hundred rows, and not every explainer takes sparse
+                X_transformed = X_transformed.toarray()
+            X_background_transformed = X_transformed[:self.MAX_BACKGROUND_SAMPLES]
+            X_explain_transformed = X_transformed[:self.MAX_EXPLAIN_SAMPLES]
 
             # Get feature names after preprocessing
-            try:
-                feature_names = self.preprocessor.get_feature_names_out().tolist()
-            except Exception:
-                feature_names = [f'feature_{i}' for i in range(X_background_transformed.shape[1])]
+            feature_names = self.feature_names
+            if feature_names is None:
+                try:
+                    feature_names = self.preprocessor.get_feature_names_out().tolist()
+                except Exception:
+                    feature_names = [f'feature_{i}' for i in range(X_background_transformed.shape[1])]
 
             # Select explainer based on model type
             shap_values = self._compute_with_appropriate_explainer(
@@ -116,34 +154,44 @@ class SHAPExplainerService:
 
         if self.algorithm_type in self.TREE_MODELS:
             logger.info(f'Using TreeExplainer for {self.algorithm_type}')
-            explainer = shap.TreeExplainer(self.model)
+            # Path-dependent attribution walks the trees' own cover counts,
+            # so no background set is passed or needed
+            explainer = shap.TreeExplainer(
+                self.model,
+                feature_perturbation='tree_path_dependent'
+            )
             explanation = explainer(X_explain)
             # Get the SHAP values from the Explanation object
             shap_values = explanation.values
 
         elif self.algorithm_type in self.LINEAR_MODELS:
-            logger.info(f'Using LinearExplainer for {self.algorithm_type}')
-            explainer = shap.LinearExplainer(
-                self.model,
-                X_background
-            )
-            shap_values = explainer.shap_values(X_explain)
+            logger.info(f'Using closed-form linear SHAP for {self.algorithm_type}')
+            # Same values as shap.LinearExplainer with an independent
+            # background: coef * (x - background mean), per output
+            coef = np.atleast_2d(self.model.coef_)
+            centered = X_explain - X_background.mean(axis=0)
+            shap_values = centered[:, :, np.newaxis] * coef.T[np.newaxis]
+            if shap_values.shape[2] == 1:
+                shap_values = shap_values[:, :, 0]
 
         else:
             # Fallback to KernelExplainer (works for any model but slower)
             logger.info(f'Using KernelExplainer for {self.algorithm_type} (slower)')
 
-            # Use smaller samples for KernelExplainer (very slow)
-            if len(X_background) > 50:
-                X_background = X_background[:50]
-            if len(X_explain) > 50:
-                X_explain = X_explain[:50]
+            # Summarize the background with k-means: KernelExplainer cost is
+            # linear in background size, so a few weighted centroids replace
+            # every background row
+            n_clusters = min(self.KERNEL_BACKGROUND_CLUSTERS, X_background.shape[0])
+            background_summary = shap.kmeans(X_background, n_clusters)
 
-            def model_predict(X):
-                return self.model.predict(X)
+            X_explain = X_explain[:self.MAX_KERNEL_EXPLAIN_SAMPLES]
 
-            explainer = shap.KernelExplainer(model_predict, X_background)
-            shap_values = explainer.shap_values(X_explain, nsamples=100)
+            explainer = shap.KernelExplainer(self.model.predict, background_summary)
+            shap_values = explainer.shap_values(
+                X_explain,
+                nsamples=self.KERNEL_NSAMPLES,
+                silent=True
+            )
 
         return shap_values
 
@@ -5,31 +5,34 @@ Handles the complete ML training pipeline including
 preprocessing, model training, evaluation, and selection.
 """
 
+import io
+import json
 import logging
 import os
-import tempfile
 import time
-from datetime import datetime
-from typing import Any
+from datetime import date, datetime
+from datetime import time as dt_time
+from typing import Any, Callable
 
 import joblib
 import numpy as np
 import pandas as pd
 from django.conf import settings
-from django.core.files import File
+from django.core.files.base import ContentFile
+from django.db import transaction
 from django.utils import timezone
+from joblib import Parallel, delayed
+from scipy import sparse
 from sklearn.compose import ColumnTransformer
-from sklearn.ensemble import GradientBoostingClassifier, GradientBoostingRegressor
-from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.ensemble import HistGradientBoostingClassifier, HistGradientBoostingRegressor
 from sklearn.impute import SimpleImputer
-from sklearn.linear_model import LinearRegression, LogisticRegression
-from sklearn.model_selection import cross_val_score, train_test_split
+from sklearn.model_selection import train_test_split
 from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import OneHotEncoder, StandardScaler
-from sklearn.svm import SVC, SVR
+from sklearn.preprocessing import FunctionTransformer, OneHotEncoder, StandardScaler
 
 from apps.core.exceptions import TrainingError
 from apps.datasets.models import Dataset
+from apps.ml.fitting import fit_candidate, fit_transform_splits, to_dense, to_float32
 from apps.ml.models import TrainedModel, TrainingJob
 
 from .evaluator import ModelEvaluatorService
@@ -37,6 +40,34 @@ from .explainer import SHAPExplainerService
 
 logger = logging.getLogger(__name__)
 
+# Intel's oneDAL-backed drop-in estimators when scikit-learn-intelex is
+# installed; they subclass the stock estimators, so SHAP and the evaluator
+# treat them the same
+try:
+    from sklearnex.ensemble import RandomForestClassifier, RandomForestRegressor
+    from sklearnex.linear_model import LinearRegression, LogisticRegression
+    from sklearnex.svm import SVC, SVR
+    ESTIMATOR_BACKEND = 'sklearnex'
+except ImportError:
+    from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+    from sklearn.linear_model import LinearRegression, LogisticRegression
+    from sklearn.svm import SVC, SVR
+    ESTIMATOR_BACKEND = 'sklearn'
+
+try:
+    from skl2onnx import to_onnx
+    from skl2onnx.common.data_types import FloatTensorType
+    ONNX_EXPORT_AVAILABLE = True
+except ImportError:
+    ONNX_EXPORT_AVAILABLE = False
+
+try:
+    import lz4  # noqa: F401
+    # Fast compression; shrinks forest pickles several-fold
+    MODEL_COMPRESSION = ('lz4', 3)
+except ImportError:
+    MODEL_COMPRESSION = ('zlib', 3)
+
 
 class ModelTrainerService:
     """
@@ -61,12 +92,13 @@ class ModelTrainerService:
         'random_forest': {
             'class': RandomForestClassifier,
             'display_name': 'Random Forest',
-            'params': {'n_estimators': 100, 'max_depth': 10, 'random_state': 42},
+            'params': {'n_estimators': 100, 'max_depth': 10, 'random_state': 42, 'n_jobs': -1},
         },
         'gradient_boosting': {
-            'class': GradientBoostingClassifier,
+            'class': HistGradientBoostingClassifier,
             'display_name': 'Gradient Boosting',
-            'params': {'n_estimators': 100, 'max_depth': 5, 'random_state': 42},
+            'params': {'max_iter': 200, 'max_depth': 8, 'early_stopping': 'auto', 'random_state': 42},
+            'dense_input': True,
         },
         'svm': {
             'class': SVC,
@@ -77,6 +109,7 @@ class ModelTrainerService:
                 'random_state': 42,
                 'max_iter': 5000,
             },
+            'dense_input': True,
         },
     }
 
@@ -89,12 +122,13 @@ class ModelTrainerService:
         'random_forest': {
             'class': RandomForestRegressor,
             'display_name': 'Random Forest',
-            'params': {'n_estimators': 100, 'max_depth': 10, 'random_state': 42},
+            'params': {'n_estimators': 100, 'max_depth': 10, 'random_state': 42, 'n_jobs': -1},
         },
         'gradient_boosting': {
-            'class': GradientBoostingRegressor,
+            'class': HistGradientBoostingRegressor,
             'display_name': 'Gradient Boosting',
-            'params': {'n_estimators': 100, 'max_depth': 5, 'random_state': 42},
+            'params': {'max_iter': 200, 'max_depth': 8, 'early_stopping': 'auto', 'random_state': 42},
+            'dense_input': True,
         },
         'svm': {
             'class': SVR,
@@ -103,11 +137,33 @@ class ModelTrainerService:
                 'kernel': 'rbf',
                 'max_iter': 5000,
             },
+            'dense_input': True,
         },
     }
 
-    def __init__(self, training_job: TrainingJob):
+    # Classifiers whose final estimator is also exported to ONNX for serving.
+    # Regressors are not: the float32 graph drifts from the float64 pipeline
+    # on large targets, so served values would not match the stored metrics
+    ONNX_EXPORT_MODELS = {'logistic_regression', 'svm'}
+
+    # Maximum rows used for cross-validation
+    MAX_CV_SAMPLES = 20_000
+
+    # CSV files above this size are read in chunks instead of all at once
+    CHUNKED_READ_THRESHOLD = 500 * 1024 * 1024
+    CSV_CHUNK_SIZE = 200_000
+
+    # Minimum seconds between progress writes within the same status
+    PROGRESS_WRITE_INTERVAL = 1.0
+
+    def __init__(
+        self,
+        training_job: TrainingJob,
+        progress_callback: Callable[[str, float | None], None] | None = None
+    ):
         self.job = training_job
+        self.progress_callback = progress_callback
+        self._last_status_write = 0.0
         self.dataset = training_job.dataset
         self.df: pd.DataFrame | None = None
         self.X_train = None
@@ -115,7 +171,10 @@ class ModelTrainerService:
         self.y_train = None
         self.y_test = None
         self.preprocessor = None
+        self.feature_names_out = None
+        self.input_schema: dict = {}
         self.evaluator = ModelEvaluatorService()
+        self.memory = joblib.Memory(settings.ML_CACHE_DIR, verbose=0)
 
     def train(self) -> TrainingJob:
         """
@@ -125,13 +184,18 @@ class ModelTrainerService:
             Updated TrainingJob with results
         """
         try:
-            self._update_status(TrainingJob.Status.RUNNING, 'Loading data')
             self.job.started_at = timezone.now()
-            self.job.save()
+            self._update_status(
+                TrainingJob.Status.RUNNING, 'Loading data', started_at=self.job.started_at
+            )
 
-            # Load and prepare data
-            self.df = self._load_dataset()
-            self._prepare_features()
+            # Load only the columns training needs
+            self._prepare_features(self._load_columns())
+            self.df = self._load_dataset(
+                usecols=[*self.job.feature_columns, self.job.target_column]
+            )
+            self._resolve_task_type()
+            self.input_schema = self._build_input_schema()
 
             # Split data
             self._update_status(TrainingJob.Status.RUNNING, 'Splitting data', 10)
@@ -150,10 +214,15 @@ class ModelTrainerService:
             best_model = self._select_best_model(trained_models)
 
             # Complete
-            self._update_status(TrainingJob.Status.COMPLETED, 'Complete', 100)
+            self.job.status = TrainingJob.Status.COMPLETED
+            self.job.current_step = 'Complete'
+            self.job.progress = 100
             self.job.best_model = best_model
             self.job.completed_at = timezone.now()
-            self.job.save()
+            self.job.save(update_fields=[
+                'status', 'current_step', 'progress', 'best_model',
+                'completed_at', 'updated_at',
+            ])
 
             logger.info(f'Training completed for job {self.job.id}')
             return self.job
@@ -163,59 +232,174 @@ class ModelTrainerService:
             self.job.status = TrainingJob.Status.ERROR
             self.job.error_message = str(e)
             self.job.completed_at = timezone.now()
-            self.job.save()
+            self.job.save(update_fields=[
+                'status', 'error_message', 'completed_at', 'updated_at',
+            ])
             raise TrainingError(
                 detail=f'Training failed: {str(e)}',
                 meta={'job_id': str(self.job.id)}
             )
 
-    def _update_status(self, status: str, step: str, progress: float = None) -> None:
-        """Update job status."""
-        self.job.status = status
-        self.job.current_step = step
+    def _update_status(
+        self, status: str, step: str, progress: float = None, **extra_fields
+    ) -> None:
+        """
+        Update job status with a single UPDATE of the changed columns.
+
+        Progress heartbeats run many times per job, so this skips model
+        save() and leaves the JSON columns untouched. Ticks that arrive
+        within PROGRESS_WRITE_INTERVAL of the last write, without a status
+        change or extra fields, only update the in-memory job.
+        """
+        now = time.monotonic()
+        throttled = (
+            not extra_fields
+            and status == self.job.status
+            and now - self._last_status_write < self.PROGRESS_WRITE_INTERVAL
+        )
+
+        fields = {'status': status, 'current_step': step, **extra_fields}
         if progress is not None:
-            self.job.progress = progress
-        self.job.save()
+            fields['progress'] = progress
+        fields['updated_at'] = timezone.now()
+
+        for field, value in fields.items():
+            setattr(self.job, field, value)
+        if throttled:
+            return
 
-    def _load_dataset(self) -> pd.DataFrame:
-        """Load the dataset from file."""
+        TrainingJob.objects.filter(pk=self.job.pk).update(**fields)
+        self._last_status_write = now
+
+        if self.progress_callback is not None:
+            try:
+                self.progress_callback(step, progress)
+            except Exception as e:
+                logger.warning(f'Progress callback failed for job {self.job.id}: {e}')
+
+    def _load_columns(self) -> list[str]:
+        """Read only the header row of the dataset file."""
+        file_path = self.dataset.file.path
+        file_type = self.dataset.file_type.lower()
+
+        if file_type == 'csv':
+            df = pd.read_csv(file_path, nrows=0)
+        elif file_type in ['xlsx', 'xls']:
+            df = self._read_excel(file_path, nrows=0)
+        else:
+            raise TrainingError(f'Unsupported file type: {file_type}')
+
+        return df.columns.tolist()
+
+    def _load_dataset(self, usecols: list[str] | None = None) -> pd.DataFrame:
+        """
+        Load the dataset from file.
+
+        Args:
+            usecols: Columns to parse; others are skipped while reading
+        """
         file_path = self.dataset.file.path
         file_type = self.dataset.file_type.lower()
 
         if file_type == 'csv':
-            df = pd.read_csv(file_path, low_memory=False)
+            df = self._read_csv(file_path, usecols=usecols)
         elif file_type in ['xlsx', 'xls']:
-            df = pd.read_excel(file_path)
+            df = self._read_excel(file_path, usecols=usecols)
         else:
             raise TrainingError(f'Unsupported file type: {file_type}')
 
         return df
 
-    def _prepare_features(self) -> None:
-        """Prepare feature and target columns."""
+    def _read_excel(self, file_path: str, **kwargs) -> pd.DataFrame:
+        """Read an Excel file, preferring the Rust-backed calamine engine."""
+        try:
+            return pd.read_excel(file_path, engine='calamine', **kwargs)
+        except (ImportError, ValueError) as e:
+            logger.info(f'Calamine reader unavailable, using default: {e}')
+            return pd.read_excel(file_path, **kwargs)
+
+    def _read_csv(self, file_path: str, usecols: list[str] | None = None) -> pd.DataFrame:
+        """
+        Read a CSV file with the multi-threaded PyArrow parser.
+
+        Falls back to the default C parser when PyArrow is not installed or
+        cannot parse the file (e.g. a column whose type changes mid-file).
+        Files above CHUNKED_READ_THRESHOLD are read in chunks by the C parser
+        to bound peak memory.
+        """
+        if os.path.getsize(file_path) > self.CHUNKED_READ_THRESHOLD:
+            chunks = pd.read_csv(
+                file_path, usecols=usecols, chunksize=self.CSV_CHUNK_SIZE, low_memory=False
+            )
+            return pd.concat(chunks, ignore_index=True)
+
+        try:
+            df = pd.read_csv(file_path, engine='pyarrow', usecols=usecols)
+        except (ImportError, ValueError) as e:
+            logger.info(f'PyArrow CSV reader failed, using default parser: {e}')
+            return pd.read_csv(file_path, usecols=usecols, low_memory=False)
+
+        # Match the C parser's output: PyArrow infers dates/timestamps that the
+        # C parser leaves as text, and marks missing strings as None, which
+        # the imputers don't treat as missing
+        for col in df.select_dtypes(include=['object', 'datetime', 'datetimetz']).columns:
+            series = df[col]
+            missing = series.isna()
+            non_null = series[~missing]
+            is_temporal = series.dtype != object or (
+                len(non_null) > 0 and isinstance(non_null.iloc[0], (date, dt_time))
+            )
+            if is_temporal:
+                series = series.astype(str)
+            df[col] = series.where(~missing, np.nan)
+
+        return df
+
+    def _prepare_features(self, columns: list[str]) -> None:
+        """
+        Validate and resolve feature and target columns.
+
+        Args:
+            columns: Column names from the dataset header
+        """
         target_col = self.job.target_column
 
-        if target_col not in self.df.columns:
+        if target_col not in columns:
             raise TrainingError(f'Target column "{target_col}" not found in dataset')
 
         # Get feature columns
         if self.job.feature_columns:
             feature_cols = self.job.feature_columns
             # Validate all feature columns exist
-            missing = set(feature_cols) - set(self.df.columns)
+            missing = set(feature_cols) - set(columns)
             if missing:
                 raise TrainingError(f'Feature columns not found: {missing}')
         else:
             # Use all columns except target
-            feature_cols = [c for c in self.df.columns if c != target_col]
+            feature_cols = [c for c in columns if c != target_col]
             self.job.feature_columns = feature_cols
-            self.job.save()
+            self.job.save(update_fields=['feature_columns', 'updated_at'])
 
-        # Detect task type if not set
+    def _resolve_task_type(self) -> None:
+        """Detect the task type from the target column if not set."""
         if not self.job.task_type:
-            self.job.task_type = self._detect_task_type(self.df[target_col])
+            self.job.task_type = self._detect_task_type(self.df[self.job.target_column])
             self.job.task_type_auto_detected = True
-            self.job.save()
+            self.job.save(update_fields=['task_type', 'task_type_auto_detected', 'updated_at'])
+
+    def _build_input_schema(self) -> dict:
+        """Describe each feature's dtype and nullability for prediction input."""
+        features = self.df[self.job.feature_columns]
+        # One vectorized null scan over all feature columns
+        nullable = features.isna().any(axis=0)
+
+        return {
+            col: {
+                'dtype': 'numeric' if pd.api.types.is_numeric_dtype(dtype) else 'categorical',
+                'nullable': bool(nullable[col]),
+            }
+            for col, dtype in features.dtypes.items()
+        }
 
     def _detect_task_type(self, target_series: pd.Series) -> str:
         """Detect whether this is classification or regression."""
@@ -254,6 +438,10 @@ class ModelTrainerService:
             X, y, test_size=0.2, random_state=42
         )
 
+        # Combined split, shared by cross-validation and SHAP
+        self.X_full = pd.concat([self.X_train, self.X_test])
+        self.y_full = pd.concat([self.y_train, self.y_test])
+
     def _create_preprocessor(self) -> None:
         """Create the preprocessing pipeline."""
         feature_cols = self.job.feature_columns
@@ -268,114 +456,228 @@ class ModelTrainerService:
         if numeric_cols:
             numeric_transformer = Pipeline([
                 ('imputer', SimpleImputer(strategy='median')),
-                ('scaler', StandardScaler())
+                ('scaler', StandardScaler()),
+                # float32 halves memory traffic for every downstream fit
+                ('float32', FunctionTransformer(to_float32, feature_names_out='one-to-one'))
             ])
             transformers.append(('num', numeric_transformer, numeric_cols))
 
         if categorical_cols:
             categorical_transformer = Pipeline([
                 ('imputer', SimpleImputer(strategy='constant', fill_value='missing')),
-                ('encoder', OneHotEncoder(handle_unknown='ignore', sparse_output=False))
+                # Sparse one-hot output keeps high-cardinality columns from
+                # exploding into a dense matrix
+                ('encoder', OneHotEncoder(
+                    handle_unknown='ignore', sparse_output=True, dtype=np.float32
+                ))
             ])
             transformers.append(('cat', categorical_transformer, categorical_cols))
 
-        self.preprocessor = ColumnTransformer(
+        preprocessor = ColumnTransformer(
             transformers=transformers,
             remainder='drop'
         )
 
-        # Fit the preprocessor
-        self.preprocessor.fit(self.X_train)
+        # Fit the preprocessor and transform the splits once; candidates fit
+        # and predict on these. Cached on disk, so re-runs on the same data
+        # skip the work.
+        self.preprocessor, self.X_train_t, self.X_test_t = self.memory.cache(
+            fit_transform_splits
+        )(preprocessor, self.X_train, self.X_test)
+
+        # Resolve output feature names once; every candidate reuses them
+        self.feature_names_out = self.preprocessor.get_feature_names_out().tolist()
+
+        # Cross-validation only ranks candidates, so cap its rows on very
+        # large datasets
+        if sparse.issparse(self.X_train_t):
+            X_full_t = sparse.vstack([self.X_train_t, self.X_test_t], format='csr')
+        else:
+            X_full_t = np.vstack([self.X_train_t, self.X_test_t])
+        if len(self.y_full) > self.MAX_CV_SAMPLES:
+            rng = np.random.default_rng(42)
+            idx = np.sort(rng.choice(len(self.y_full), self.MAX_CV_SAMPLES, replace=False))
+            self.X_cv_t, self.y_cv = X_full_t[idx], self.y_full.iloc[idx]
+        else:
+            self.X_cv_t, self.y_cv = X_full_t, self.y_full
 
     def _train_all_models(self) -> list[TrainedModel]:
-        """Train all candidate models."""
+        """
+        Train all candidate models.
+
+        Candidates are fitted and cross-validated in worker processes,
+        evaluated on the test split concurrently, then explained and saved.
+        """
         if self.job.task_type == TrainingJob.TaskType.CLASSIFICATION:
             models_config = self.CLASSIFICATION_MODELS
         else:
             models_config = self.REGRESSION_MODELS
 
-        trained_models = []
         total_models = len(models_config)
 
-        for i, (name, config) in enumerate(models_config.items()):
-            progress = 30 + (60 * (i + 1) / total_models)
+        logger.info(
+            f'Training {total_models} models for job {self.job.id} '
+            f'with {ESTIMATOR_BACKEND} estimators'
+        )
+
+        # Fit and cross-validate every candidate in parallel
+        self._update_status(
+            TrainingJob.Status.RUNNING,
+            f'Training {total_models} models',
+            30
+        )
+        results = Parallel(
+            n_jobs=min(total_models, os.cpu_count() or 1),
+            backend='loky',
+            return_as='generator',
+        )(
+            delayed(fit_candidate)(
+                name,
+                config,
+                self.X_train_t,
+                self.y_train,
+                self.X_cv_t,
+                self.y_cv,
+                # Plain str: workers must not unpickle Django enums
+                str(self.job.task_type),
+                self.memory,
+            )
+            for name, config in models_config.items()
+        )
+
+        fitted = {}
+        for i, result in enumerate(results):
+            name = result['name']
+            progress = 30 + (30 * (i + 1) / total_models)
             self._update_status(
                 TrainingJob.Status.RUNNING,
-                f'Training {config["display_name"]}',
+                f'Trained {models_config[name]["display_name"]}',
                 progress
             )
 
+            if 'error' in result:
+                logger.warning(f'Failed to train {name}: {result["error"]}')
+                continue
+
+            # Reuse the already-fitted preprocessor for the saved pipeline
+            steps = [('preprocessor', self.preprocessor)]
+            if models_config[name].get('dense_input'):
+                steps.append(('densify', FunctionTransformer(to_dense, accept_sparse=True)))
+            steps.append(('model', result['model']))
+            result['pipeline'] = Pipeline(steps)
+            fitted[name] = result
+
+        # Evaluate the fitted candidates concurrently
+        self._update_status(TrainingJob.Status.RUNNING, 'Evaluating models', 60)
+        metrics_by_name = self._evaluate_models({
+            name: (result['model'], models_config[name].get('dense_input', False))
+            for name, result in fitted.items()
+        })
+
+        # Explain and store artifacts; rows are inserted together below
+        trained_models = []
+        for i, (name, result) in enumerate(fitted.items()):
+            config = models_config[name]
+            progress = 60 + (30 * (i + 1) / len(fitted))
+            self._update_status(
+                TrainingJob.Status.RUNNING,
+                f'Saving {config["display_name"]}',
+                progress
+            )
+
+            metrics = metrics_by_name.get(name)
+            if metrics is None:
+                continue
+            try:
+                # One NaN or inf would fail the bulk insert for every candidate
+                json.dumps(metrics, allow_nan=False)
+            except ValueError:
+                logger.warning(f'Skipping {name}: metrics are not finite')
+                continue
+
             try:
-                trained_model = self._train_single_model(name, config)
+                trained_model = self._build_trained_model(
+                    name, config, result['pipeline'], metrics, result['cv_scores']
+                )
                 trained_models.append(trained_model)
             except Exception as e:
                 logger.warning(f'Failed to train {name}: {str(e)}')
                 continue
 
+        if trained_models:
+            try:
+                with transaction.atomic():
+                    TrainedModel.objects.bulk_create(trained_models)
+            except Exception:
+                # The artifacts are already in storage; drop them with the rows
+                self._discard_artifacts(trained_models)
+                raise
+
+        # Keep the on-disk cache bounded
+        try:
+            self.memory.reduce_size(bytes_limit=settings.ML_CACHE_BYTES_LIMIT)
+        except Exception as e:
+            logger.warning(f'Failed to trim ML cache: {e}')
+
         if not trained_models:
             raise TrainingError('All models failed to train')
 
         return trained_models
 
-    def _train_single_model(self, name: str, config: dict) -> TrainedModel:
-        """Train a single model and save it."""
-        # Create the full pipeline
-        model_class = config['class']
-        model_params = config['params']
-        model = model_class(**model_params)
-
-        pipeline = Pipeline([
-            ('preprocessor', self.preprocessor),
-            ('model', model)
-        ])
-
-        # Train
-        pipeline.fit(self.X_train, self.y_train)
-
-        # Evaluate
-        y_pred = pipeline.predict(self.X_test)
-        metrics = self.evaluator.evaluate(
-            self.y_test,
-            y_pred,
-            self.job.task_type,
-            pipeline=pipeline if hasattr(pipeline.named_steps['model'], 'predict_proba') else None,
-            X_test=self.X_test
-        )
+    def _evaluate_models(self, models: dict[str, tuple]) -> dict[str, dict | None]:
+        """
+        Evaluate fitted estimators on the preprocessed test split in parallel.
 
-        # Cross-validation with adaptive folds for small datasets
-        X_full = pd.concat([self.X_train, self.X_test])
-        y_full = pd.concat([self.y_train, self.y_test])
+        Threads share X_test_t/y_test without copying, and the heavy
+        predict calls release the GIL.
 
-        # Determine number of CV folds based on data size
-        if self.job.task_type == TrainingJob.TaskType.CLASSIFICATION:
-            # For classification, ensure each class has enough samples per fold
-            min_class_count = y_full.value_counts().min()
-            n_folds = min(5, max(2, min_class_count))
-        else:
-            # For regression, base on total sample count
-            n_folds = min(5, max(2, len(y_full) // 5))
+        Args:
+            models: (fitted estimator, needs dense input) keyed by model name
+
+        Returns:
+            Metrics keyed by model name, None where evaluation failed
+        """
+        # Densify the test split once for the estimators that need it
+        X_test_dense = None
+        if any(dense for _, dense in models.values()):
+            X_test_dense = to_dense(self.X_test_t)
+
+        results = Parallel(n_jobs=-1, prefer='threads')(
+            delayed(self._evaluate_model)(name, model, X_test_dense if dense else self.X_test_t)
+            for name, (model, dense) in models.items()
+        )
+        return dict(zip(models.keys(), results))
 
-        # Run cross-validation with fallback for edge cases
+    def _evaluate_model(self, name: str, model, X_test_t) -> dict | None:
+        """Evaluate a single fitted estimator on the preprocessed test split."""
         try:
-            cv_scores = cross_val_score(
-                pipeline,
-                X_full,
-                y_full,
-                cv=n_folds,
-                scoring='f1_weighted' if self.job.task_type == TrainingJob.TaskType.CLASSIFICATION else 'neg_root_mean_squared_error'
-            )
-        except ValueError as e:
-            # Fallback: use simple KFold if stratified fails (e.g., too many classes)
-            from sklearn.model_selection import KFold
-            logger.warning(f'Stratified CV failed, using KFold: {e}')
-            kfold = KFold(n_splits=min(5, max(2, len(y_full) // 5)), shuffle=True, random_state=42)
-            cv_scores = cross_val_score(
-                pipeline,
-                X_full,
-                y_full,
-                cv=kfold,
-                scoring='f1_weighted' if self.job.task_type == TrainingJob.TaskType.CLASSIFICATION else 'neg_root_mean_squared_error'
+            y_pred = model.predict(X_test_t)
+            return self.evaluator.evaluate(
+                self.y_test,
+                y_pred,
+                self.job.task_type,
+                pipeline=model if hasattr(model, 'predict_proba') else None,
+                X_test=X_test_t
             )
+        except Exception as e:
+            logger.warning(f'Failed to evaluate {name}: {str(e)}')
+            return None
+
+    def _build_trained_model(
+        self,
+        name: str,
+        config: dict,
+        pipeline: Pipeline,
+        metrics: dict,
+        cv_scores: list[float]
+    ) -> TrainedModel:
+        """
+        Explain a fitted, evaluated candidate and store its artifacts.
+
+        The model file is written to storage, but the returned record is
+        unsaved so that all candidates can be inserted in one statement.
+        """
+        model_params = config['params']
 
         # Get feature importance if available
         feature_importance = self._get_feature_importance(pipeline)
@@ -386,33 +688,29 @@ class ModelTrainerService:
             shap_service = SHAPExplainerService(
                 pipeline=pipeline,
                 algorithm_type=name,
-                feature_columns=self.job.feature_columns
+                feature_columns=self.job.feature_columns,
+                feature_names=self.feature_names_out
             )
             # Use combined train/test data for SHAP background
-            X_combined = pd.concat([self.X_train, self.X_test])
-            shap_data = shap_service.compute_shap_values(X_combined)
+            shap_data = shap_service.compute_shap_values(self.X_full)
             if shap_data:
                 logger.info(f'SHAP values computed successfully for {name}')
         except Exception as e:
             logger.warning(f'SHAP computation failed for {name}: {e}')
             # Continue without SHAP - it's optional
 
-        # Build input schema
-        input_schema = {}
-        for col in self.job.feature_columns:
-            col_data = self.df[col]
-            input_schema[col] = {
-                'dtype': 'numeric' if pd.api.types.is_numeric_dtype(col_data) else 'categorical',
-                'nullable': bool(col_data.isnull().any()),
-            }
+        # Models without native importances (histogram boosting, RBF SVMs)
+        # fall back to mean |SHAP| per feature
+        if not feature_importance:
+            feature_importance = shap_data.get('shap_importance', {})
 
-        # Save model to file
-        model_file = self._save_model(pipeline, name)
+        # Serialize the model
+        model_bytes = self._serialize_model(pipeline)
 
         # Create TrainedModel record
         algorithm_type = self._get_algorithm_type(name)
 
-        trained_model = TrainedModel.objects.create(
+        trained_model = TrainedModel(
             training_job=self.job,
             dataset=self.dataset,
             owner=self.job.owner,
@@ -422,29 +720,44 @@ class ModelTrainerService:
             task_type=self.job.task_type,
             feature_columns=self.job.feature_columns,
             target_column=self.job.target_column,
-            input_schema=input_schema,
-            preprocessing_params={
-                'numeric_cols': self.preprocessor.transformers_[0][2] if self.preprocessor.transformers_ else [],
-                'categorical_cols': self.preprocessor.transformers_[1][2] if len(self.preprocessor.transformers_) > 1 else [],
-            },
+            input_schema=self.input_schema,
             metrics=metrics,
             feature_importance=feature_importance,
-            cross_val_scores=[float(s) for s in cv_scores],
+            cross_val_scores=cv_scores,
             hyperparameters=model_params,
             shap_values=shap_data,
         )
+        trained_model.set_preprocessing_params({
+            'numeric_cols': self.preprocessor.transformers_[0][2] if self.preprocessor.transformers_ else [],
+            'categorical_cols': self.preprocessor.transformers_[1][2] if len(self.preprocessor.transformers_) > 1 else [],
+            'feature_names_out': self.feature_names_out,
+        })
 
         # Attach the model file
-        with open(model_file, 'rb') as f:
-            trained_model.model_file.save(f'{name}.joblib', File(f))
-        trained_model.model_size = os.path.getsize(model_file)
-        trained_model.save()
+        trained_model.model_file.save(f'{name}.joblib', ContentFile(model_bytes), save=False)
+        trained_model.model_size = len(model_bytes)
 
-        # Clean up temp file
-        os.remove(model_file)
+        onnx_bytes = self._export_onnx(name, pipeline)
+        if onnx_bytes:
+            trained_model.onnx_file.save(f'{name}.onnx', ContentFile(onnx_bytes), save=False)
 
         return trained_model
 
+    def _discard_artifacts(self, trained_models: list[TrainedModel]) -> None:
+        """Delete the stored files of models whose rows were never inserted."""
+        for trained_model in trained_models:
+            for field_file in (
+                trained_model.model_file,
+                trained_model.preprocessing_params_file,
+                trained_model.onnx_file,
+            ):
+                if not field_file:
+                    continue
+                try:
+                    field_file.delete(save=False)
+                except Exception as e:
+                    logger.warning(f'Failed to delete model file {field_file.name}: {e}')
+
     def _get_algorithm_type(self, name: str) -> str:
         """Map model name to algorithm type."""
         mapping = {
@@ -462,82 +775,103 @@ class ModelTrainerService:
             model = pipeline.named_steps['model']
 
             if hasattr(model, 'feature_importances_'):
-                importances = model.feature_importances_
-
-                # Get feature names after preprocessing
-                preprocessor = pipeline.named_steps['preprocessor']
-                feature_names = preprocessor.get_feature_names_out()
-
-                # Create importance dict
-                importance_dict = {}
-                for name, importance in zip(feature_names, importances):
-                    importance_dict[name] = float(importance)
-
-                # Sort by importance
-                importance_dict = dict(
-                    sorted(importance_dict.items(), key=lambda x: x[1], reverse=True)
-                )
-
-                return importance_dict
-
+                importances = np.asarray(model.feature_importances_, dtype=float)
             elif hasattr(model, 'coef_'):
-                coefs = np.abs(model.coef_)
-                if len(coefs.shape) > 1:
-                    coefs = coefs.mean(axis=0)
-
-                preprocessor = pipeline.named_steps['preprocessor']
-                feature_names = preprocessor.get_feature_names_out()
-
-                importance_dict = {}
-                for name, coef in zip(feature_names, coefs):
-                    importance_dict[name] = float(coef)
-
-                importance_dict = dict(
-                    sorted(importance_dict.items(), key=lambda x: x[1], reverse=True)
-                )
+                importances = np.abs(model.coef_)
+                if importances.ndim > 1:
+                    importances = importances.mean(axis=0)
+            else:
+                return {}
 
-                return importance_dict
+            # Sort by importance (descending) in NumPy rather than in Python
+            order = np.argsort(-importances, kind='stable')
+            feature_names = np.asarray(self.feature_names_out, dtype=object)
+            return dict(zip(feature_names[order].tolist(), importances[order].tolist()))
 
         except Exception as e:
             logger.warning(f'Failed to extract feature importance: {e}')
 
         return {}
 
-    def _save_model(self, pipeline, name: str) -> str:
-        """Save the trained pipeline to a temp file."""
-        temp_file = tempfile.NamedTemporaryFile(
-            delete=False,
-            suffix='.joblib',
-            prefix=f'model_{name}_'
-        )
-        temp_path = temp_file.name
-        temp_file.close()
+    def _serialize_model(self, pipeline) -> bytes:
+        """Serialize the trained pipeline to compressed bytes."""
+        # Class labels as strings, ready to key prediction probabilities
+        model = pipeline.named_steps['model']
+        class_labels = [str(c) for c in model.classes_] if hasattr(model, 'classes_') else None
 
         model_data = {
             'pipeline': pipeline,
             'feature_columns': self.job.feature_columns,
             'target_column': self.job.target_column,
             'task_type': self.job.task_type,
+            'class_labels': class_labels,
             'training_date': datetime.utcnow().isoformat(),
         }
 
-        joblib.dump(model_data, temp_path)
-        return temp_path
+        buffer = io.BytesIO()
+        joblib.dump(model_data, buffer, compress=MODEL_COMPRESSION, protocol=5)
+        return buffer.getvalue()
+
+    def _export_onnx(self, name: str, pipeline: Pipeline) -> bytes | None:
+        """
+        Export a classifier's final estimator to ONNX, if supported.
+
+        Only the estimator is converted; preprocessing stays in the joblib
+        pipeline and its float32 output is fed to the ONNX graph at serving
+        time. Export is optional and never fails training.
+
+        Args:
+            name: Candidate model name
+            pipeline: Fitted pipeline with a 'model' step
+
+        Returns:
+            Serialized ONNX model, or None if not exported
+        """
+        if (
+            not ONNX_EXPORT_AVAILABLE
+            or self.job.task_type != TrainingJob.TaskType.CLASSIFICATION
+            or name not in self.ONNX_EXPORT_MODELS
+        ):
+            return None
+
+        model = pipeline.named_steps['model']
+        options = {id(model): {'zipmap': False}} if hasattr(model, 'classes_') else None
+        try:
+            onnx_model = to_onnx(
+                model,
+                initial_types=[('X', FloatTensorType([None, len(self.feature_names_out)]))],
+                options=options,
+                target_opset=17,
+            )
+        except Exception as e:
+            logger.warning(f'ONNX export failed for {name}: {e}')
+            return None
+
+        return onnx_model.SerializeToString()
 
     def _select_best_model(self, trained_models: list[TrainedModel]) -> TrainedModel:
-        """Select the best model based on metrics."""
+        """
+        Select the best model based on metrics.
+
+        Ranking runs in the database over the persisted rows, so only the
+        winning primary key is needed to pick it out of ``trained_models``.
+        """
         if not trained_models:
             raise TrainingError('No trained models to select from')
 
-        if self.job.task_type == TrainingJob.TaskType.CLASSIFICATION:
-            # Select by F1 score (higher is better)
-            best = max(trained_models, key=lambda m: m.metrics.get('f1_weighted', 0))
-        else:
-            # Select by RMSE (lower is better)
-            best = min(trained_models, key=lambda m: m.metrics.get('rmse', float('inf')))
+        if len(trained_models) == 1:
+            best = trained_models[0]
+            best.is_best = True
+            best.save(update_fields=['is_best'])
+            return best
 
-        # Mark as best
-        best.is_best = True
-        best.save()
+        ranking = self.evaluator.rank_trained_models(self.job)
+        logger.info(
+            f'Model ranking for job {self.job.id}: '
+            + ', '.join(f"{r['rank']}. {r['name']}={r['primary']}" for r in ranking)
+        )
 
-        return best
+        best_id = ranking[0]['id']
+        for model in trained_models:
+            model.is_best = model.pk == best_id
+        return next(m for m in trained_models if m.is_best)
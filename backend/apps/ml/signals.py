@@ -0,0 +1,35 @@
+"""
+Signal handlers for the ML app.
+"""
+
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import TrainedModel
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_delete, sender=TrainedModel)
+def cleanup_model_file(sender, instance, **kwargs):
+    """Remove the model artifacts from storage once the delete is committed."""
+    file_names = [
+        f.name
+        for f in (instance.model_file, instance.preprocessing_params_file, instance.onnx_file)
+        if f
+    ]
+    if not file_names:
+        return
+
+    def dispatch():
+        from .tasks import cleanup_model_file_task
+        for file_name in file_names:
+            try:
+                cleanup_model_file_task.delay(file_name)
+            except Exception as e:
+                logger.warning(f'Failed to queue cleanup for model file {file_name}: {e}')
+
+    transaction.on_commit(dispatch)
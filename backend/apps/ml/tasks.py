@@ -5,6 +5,7 @@ Celery tasks for the ML app.
 import logging
 
 from celery import shared_task
+from django.utils import timezone
 
 logger = logging.getLogger(__name__)
 
@@ -32,8 +33,18 @@ def train_models_task(self, job_id: str) -> dict:
         job.status = TrainingJob.Status.RUNNING
         job.save(update_fields=['status'])
 
+        # Stream progress to the result backend so callers polling the
+        # task see a live heartbeat between the DB status updates
+        def report_progress(step: str, progress: float | None) -> None:
+            self.update_state(
+                state='PROGRESS',
+                meta={'job_id': job_id, 'step': step, 'progress': progress},
+            )
+
         # Run training
-        trainer = ModelTrainerService(job)
+        trainer = ModelTrainerService(
+            job, progress_callback=report_progress if self.request.id else None
+        )
         job = trainer.train()
 
         logger.info(f'Async training completed for job {job_id}')
@@ -51,14 +62,15 @@ def train_models_task(self, job_id: str) -> dict:
     except Exception as e:
         logger.error(f'Async training failed for job {job_id}: {str(e)}')
 
-        # Update job status to error
-        try:
-            job = TrainingJob.objects.get(id=job_id)
-            job.status = TrainingJob.Status.ERROR
-            job.error_message = str(e)
-            job.save(update_fields=['status', 'error_message'])
-        except TrainingJob.DoesNotExist:
-            pass
+        # Update job status to error in a single query; update() skips
+        # auto_now, so updated_at is set explicitly
+        now = timezone.now()
+        TrainingJob.objects.filter(id=job_id).update(
+            status=TrainingJob.Status.ERROR,
+            error_message=str(e)[:10_000],
+            completed_at=now,
+            updated_at=now,
+        )
 
         # Don't retry - just log and return
         return {
@@ -66,3 +78,20 @@ def train_models_task(self, job_id: str) -> dict:
             'status': 'error',
             'error': str(e),
         }
+
+
+@shared_task(ignore_result=True)
+def cleanup_model_file_task(file_name: str) -> None:
+    """
+    Delete a trained model artifact from storage.
+
+    Args:
+        file_name: Storage name of the model file
+    """
+    from django.core.files.storage import default_storage
+
+    try:
+        default_storage.delete(file_name)
+        logger.info(f'Deleted model file {file_name}')
+    except Exception as e:
+        logger.warning(f'Failed to delete model file {file_name}: {e}')
@@ -21,24 +21,21 @@ class TestSHAPExplainerService:
     @pytest.fixture
     def classification_data(self):
         """Create simple classification dataset."""
-        np.random.seed(42)
-        X = pd.DataFrame({
-            'feature1': np.random.randn(100),
-            'feature2': np.random.randn(100),
-            'feature3': np.random.randn(100)
-        })
+        rng = np.random.default_rng(42)
+        X = pd.DataFrame(
+            rng.standard_normal((100, 3)),
+            columns=['feature1', 'feature2', 'feature3']
+        )
         y = np.array([0] * 50 + [1] * 50)
         return X, y
 
     @pytest.fixture
     def regression_data(self):
         """Create simple regression dataset."""
-        np.random.seed(42)
-        X = pd.DataFrame({
-            'feature1': np.random.randn(100),
-            'feature2': np.random.randn(100)
-        })
-        y = X['feature1'] * 2 + X['feature2'] + np.random.randn(100) * 0.1
+        rng = np.random.default_rng(42)
+        values = rng.standard_normal((100, 2))
+        X = pd.DataFrame(values, columns=['feature1', 'feature2'])
+        y = pd.Series(values @ np.array([2.0, 1.0]) + rng.standard_normal(100) * 0.1)
         return X, y
 
     def _create_pipeline(self, model, X):
@@ -129,6 +126,29 @@ class TestSHAPExplainerService:
         assert 'shap_importance' in shap_data
         assert shap_data['algorithm_type'] == 'logistic_regression'
 
+    def test_linear_shap_matches_linear_explainer(self):
+        """Test closed-form linear SHAP matches shap.LinearExplainer."""
+        import shap
+
+        rng = np.random.default_rng(42)
+        X = pd.DataFrame(rng.standard_normal((150, 4)), columns=list('abcd'))
+        y = rng.integers(0, 3, 150)
+
+        pipeline = self._create_pipeline(LogisticRegression(random_state=42), X)
+        pipeline.fit(X, y)
+        X_t = pipeline.named_steps['preprocessor'].transform(X)
+        background, explain = X_t[:100], X_t[:120]
+
+        explainer = SHAPExplainerService(
+            pipeline=pipeline,
+            algorithm_type='logistic_regression',
+            feature_columns=list(X.columns)
+        )
+        values = explainer._compute_with_appropriate_explainer(background, explain)
+        expected = shap.LinearExplainer(pipeline.named_steps['model'], background).shap_values(explain)
+
+        np.testing.assert_allclose(values, np.asarray(expected), atol=1e-10)
+
     def test_shap_kernel_explainer_svm(self, classification_data):
         """Test SHAP computation for SVM using KernelExplainer (slower)."""
         X, y = classification_data
@@ -3,9 +3,6 @@ Tests for ML models.
 """
 
 import pytest
-from django.core.files.uploadedfile import SimpleUploadedFile
-
-from apps.datasets.models import Dataset
 from apps.ml.models import TrainedModel, TrainingJob
 
 
@@ -13,20 +10,8 @@ from apps.ml.models import TrainedModel, TrainingJob
 class TestTrainingJobModel:
     """Tests for the TrainingJob model."""
 
-    def test_create_training_job(self, user):
+    def test_create_training_job(self, user, dataset):
         """Test creating a training job."""
-        csv_content = b'col1,col2,target\n1,2,0\n3,4,1'
-        file = SimpleUploadedFile('test.csv', csv_content, content_type='text/csv')
-
-        dataset = Dataset.objects.create(
-            owner=user,
-            name='Test',
-            file=file,
-            original_filename='test.csv',
-            file_type='csv',
-            file_size=len(csv_content),
-        )
-
         job = TrainingJob.objects.create(
             dataset=dataset,
             owner=user,
@@ -40,100 +25,35 @@ class TestTrainingJobModel:
         assert job.owner == user
         assert job.status == TrainingJob.Status.PENDING
 
-    def test_training_job_status_choices(self, user):
+    @pytest.mark.parametrize('status_value', TrainingJob.Status.values)
+    def test_training_job_status_choices(self, training_job, status_value):
         """Test training job status choices."""
-        csv_content = b'col1,col2,target\n1,2,0'
-        file = SimpleUploadedFile('test.csv', csv_content, content_type='text/csv')
+        training_job.status = status_value
+        training_job.save(update_fields=['status'])
+        training_job.refresh_from_db(fields=['status'])
+        assert training_job.status == status_value
 
-        dataset = Dataset.objects.create(
-            owner=user,
-            name='Test',
-            file=file,
-            original_filename='test.csv',
-            file_type='csv',
-            file_size=len(csv_content),
-        )
-
-        job = TrainingJob.objects.create(
-            dataset=dataset,
-            owner=user,
-            target_column='target',
-        )
-
-        for status_value, _ in TrainingJob.Status.choices:
-            job.status = status_value
-            job.save()
-            job.refresh_from_db()
-            assert job.status == status_value
-
-    def test_training_job_task_type_choices(self, user):
+    @pytest.mark.parametrize('task_type', TrainingJob.TaskType.values)
+    def test_training_job_task_type_choices(self, user, dataset, task_type):
         """Test training job task type choices."""
-        csv_content = b'col1,col2,target\n1,2,0'
-        file = SimpleUploadedFile('test.csv', csv_content, content_type='text/csv')
-
-        dataset = Dataset.objects.create(
-            owner=user,
-            name='Test',
-            file=file,
-            original_filename='test.csv',
-            file_type='csv',
-            file_size=len(csv_content),
-        )
-
-        for task_type, _ in TrainingJob.TaskType.choices:
-            job = TrainingJob.objects.create(
-                dataset=dataset,
-                owner=user,
-                target_column='target',
-                task_type=task_type,
-            )
-            assert job.task_type == task_type
-
-    def test_training_job_progress(self, user):
-        """Test training job progress field."""
-        csv_content = b'col1,col2,target\n1,2,0'
-        file = SimpleUploadedFile('test.csv', csv_content, content_type='text/csv')
-
-        dataset = Dataset.objects.create(
-            owner=user,
-            name='Test',
-            file=file,
-            original_filename='test.csv',
-            file_type='csv',
-            file_size=len(csv_content),
-        )
-
         job = TrainingJob.objects.create(
             dataset=dataset,
             owner=user,
             target_column='target',
+            task_type=task_type,
         )
+        assert job.task_type == task_type
 
-        job.progress = 50.0
-        job.save()
-        job.refresh_from_db()
-        assert job.progress == 50.0
+    def test_training_job_progress(self, training_job):
+        """Test training job progress field."""
+        training_job.progress = 50.0
+        training_job.save(update_fields=['progress'])
+        training_job.refresh_from_db(fields=['progress'])
+        assert training_job.progress == 50.0
 
-    def test_training_job_cascade_delete(self, user):
+    def test_training_job_cascade_delete(self, dataset, training_job):
         """Test that deleting dataset deletes training jobs."""
-        csv_content = b'col1,col2,target\n1,2,0'
-        file = SimpleUploadedFile('test.csv', csv_content, content_type='text/csv')
-
-        dataset = Dataset.objects.create(
-            owner=user,
-            name='Test',
-            file=file,
-            original_filename='test.csv',
-            file_type='csv',
-            file_size=len(csv_content),
-        )
-
-        job = TrainingJob.objects.create(
-            dataset=dataset,
-            owner=user,
-            target_column='target',
-        )
-        job_id = job.id
+        job_id = training_job.id
 
         dataset.delete()
 
@@ -144,238 +64,96 @@ class TestTrainingJobModel:
 class TestTrainedModelModel:
     """Tests for the TrainedModel model."""
 
-    def test_create_trained_model(self, user):
-        """Test creating a trained model."""
-        csv_content = b'col1,col2,target\n1,2,0'
-        file = SimpleUploadedFile('test.csv', csv_content, content_type='text/csv')
-
-        dataset = Dataset.objects.create(
-            owner=user,
-            name='Test',
-            file=file,
-            original_filename='test.csv',
-            file_type='csv',
-            file_size=len(csv_content),
-        )
-
-        job = TrainingJob.objects.create(
-            dataset=dataset,
-            owner=user,
-            target_column='target',
-        )
-
-        model = TrainedModel.objects.create(
-            training_job=job,
-            dataset=dataset,
-            owner=user,
-            name='random_forest',
-            display_name='Random Forest',
-            algorithm_type=TrainedModel.AlgorithmType.RANDOM_FOREST,
-            task_type=TrainingJob.TaskType.CLASSIFICATION,
-            target_column='target',
-            feature_columns=['col1', 'col2'],
-        )
-
-        assert model.id is not None
-        assert model.name == 'random_forest'
-
-    def test_trained_model_metrics(self, user):
-        """Test that metrics are stored correctly."""
-        csv_content = b'col1,col2,target\n1,2,0'
-        file = SimpleUploadedFile('test.csv', csv_content, content_type='text/csv')
-
-        dataset = Dataset.objects.create(
-            owner=user,
-            name='Test',
-            file=file,
-            original_filename='test.csv',
-            file_type='csv',
-            file_size=len(csv_content),
-        )
-
-        job = TrainingJob.objects.create(
-            dataset=dataset,
-            owner=user,
-            target_column='target',
-        )
-
-        metrics = {
-            'accuracy': 0.95,
-            'f1_weighted': 0.94,
-            'precision': 0.93,
-            'recall': 0.92,
-        }
-
-        model = TrainedModel.objects.create(
-            training_job=job,
-            dataset=dataset,
-            owner=user,
-            name='random_forest',
-            display_name='Random Forest',
-            algorithm_type=TrainedModel.AlgorithmType.RANDOM_FOREST,
-            task_type=TrainingJob.TaskType.CLASSIFICATION,
-            target_column='target',
-            feature_columns=['col1', 'col2'],
-            metrics=metrics,
-        )
+    METRICS = {'accuracy': 0.95, 'f1_weighted': 0.94, 'precision': 0.93, 'recall': 0.92}
+
+    @pytest.mark.parametrize('fields, check', [
+        pytest.param(
+            {},
+            lambda m: m.id is not None and m.name == 'random_forest',
+            id='create',
+        ),
+        pytest.param(
+            {'metrics': METRICS},
+            lambda m: m.metrics == TestTrainedModelModel.METRICS,
+            id='metrics',
+        ),
+        pytest.param(
+            {'feature_importance': {'col1': 0.7, 'col2': 0.3}},
+            lambda m: m.feature_importance == {'col1': 0.7, 'col2': 0.3},
+            id='feature_importance',
+        ),
+        pytest.param(
+            {'metrics': {'f1_weighted': 0.94, 'accuracy': 0.95}},
+            lambda m: m.primary_metric == 0.94,  # f1_weighted for classification
+            id='primary_metric_classification',
+        ),
+        pytest.param(
+            {'task_type': TrainingJob.TaskType.REGRESSION, 'metrics': {'rmse': 5.5, 'r2': 0.85}},
+            lambda m: m.primary_metric == 5.5,  # rmse for regression
+            id='primary_metric_regression',
+        ),
+        pytest.param(
+            {'model_size': 1024 * 1024},  # 1MB
+            lambda m: 'MB' in m.model_size_display,
+            id='model_size_display',
+        ),
+    ])
+    def test_trained_model_fields(self, training_job, fields, check):
+        """Test trained model fields round-trip and derived properties."""
+        model = TrainedModel.objects.create(**{
+            'training_job': training_job,
+            'dataset': training_job.dataset,
+            'owner': training_job.owner,
+            'name': 'random_forest',
+            'display_name': 'Random Forest',
+            'algorithm_type': TrainedModel.AlgorithmType.RANDOM_FOREST,
+            'task_type': TrainingJob.TaskType.CLASSIFICATION,
+            'target_column': 'target',
+            'feature_columns': ['col1', 'col2'],
+            **fields,
+        })
 
         model.refresh_from_db()
-        assert model.metrics == metrics
-        assert model.metrics['accuracy'] == 0.95
-
-    def test_trained_model_primary_metric(self, user):
-        """Test primary_metric property."""
-        csv_content = b'col1,col2,target\n1,2,0'
-        file = SimpleUploadedFile('test.csv', csv_content, content_type='text/csv')
-
-        dataset = Dataset.objects.create(
-            owner=user,
-            name='Test',
-            file=file,
-            original_filename='test.csv',
-            file_type='csv',
-            file_size=len(csv_content),
-        )
+        assert check(model)
 
-        job = TrainingJob.objects.create(
-            dataset=dataset,
-            owner=user,
-            target_column='target',
-        )
-
-        # Classification model
-        model = TrainedModel.objects.create(
-            training_job=job,
-            dataset=dataset,
-            owner=user,
-            name='random_forest',
-            display_name='Random Forest',
-            algorithm_type=TrainedModel.AlgorithmType.RANDOM_FOREST,
-            task_type=TrainingJob.TaskType.CLASSIFICATION,
-            target_column='target',
-            feature_columns=['col1', 'col2'],
-            metrics={'f1_weighted': 0.94, 'accuracy': 0.95},
-        )
-
-        assert model.primary_metric == 0.94  # f1_weighted for classification
-
-        # Regression model
-        model.task_type = TrainingJob.TaskType.REGRESSION
-        model.metrics = {'rmse': 5.5, 'r2': 0.85}
-        model.save()
-
-        assert model.primary_metric == 5.5  # rmse for regression
-
-    def test_trained_model_feature_importance(self, user):
-        """Test feature importance storage."""
-        csv_content = b'col1,col2,target\n1,2,0'
-        file = SimpleUploadedFile('test.csv', csv_content, content_type='text/csv')
-
-        dataset = Dataset.objects.create(
-            owner=user,
-            name='Test',
-            file=file,
-            original_filename='test.csv',
-            file_type='csv',
-            file_size=len(csv_content),
-        )
-
-        job = TrainingJob.objects.create(
-            dataset=dataset,
-            owner=user,
-            target_column='target',
-        )
-
-        feature_importance = {
-            'col1': 0.7,
-            'col2': 0.3,
-        }
-
-        model = TrainedModel.objects.create(
-            training_job=job,
-            dataset=dataset,
-            owner=user,
-            name='random_forest',
-            display_name='Random Forest',
-            algorithm_type=TrainedModel.AlgorithmType.RANDOM_FOREST,
-            task_type=TrainingJob.TaskType.CLASSIFICATION,
-            target_column='target',
-            feature_columns=['col1', 'col2'],
-            feature_importance=feature_importance,
-        )
-
-        model.refresh_from_db()
-        assert model.feature_importance == feature_importance
-
-    def test_trained_model_is_best(self, user):
+    def test_trained_model_is_best(self, user, dataset, training_job):
         """Test is_best field."""
-        csv_content = b'col1,col2,target\n1,2,0'
-        file = SimpleUploadedFile('test.csv', csv_content, content_type='text/csv')
-
-        dataset = Dataset.objects.create(
-            owner=user,
-            name='Test',
-            file=file,
-            original_filename='test.csv',
-            file_type='csv',
-            file_size=len(csv_content),
-        )
-
-        job = TrainingJob.objects.create(
-            dataset=dataset,
-            owner=user,
-            target_column='target',
-        )
-
-        model1 = TrainedModel.objects.create(
-            training_job=job,
-            dataset=dataset,
-            owner=user,
-            name='model1',
-            display_name='Model 1',
-            algorithm_type=TrainedModel.AlgorithmType.LOGISTIC_REGRESSION,
-            task_type=TrainingJob.TaskType.CLASSIFICATION,
-            target_column='target',
-            is_best=True,
-        )
-
-        model2 = TrainedModel.objects.create(
-            training_job=job,
-            dataset=dataset,
-            owner=user,
-            name='model2',
-            display_name='Model 2',
-            algorithm_type=TrainedModel.AlgorithmType.RANDOM_FOREST,
-            task_type=TrainingJob.TaskType.CLASSIFICATION,
-            target_column='target',
-            is_best=False,
-        )
+        model1, model2 = TrainedModel.objects.bulk_create([
+            TrainedModel(
+                training_job=training_job,
+                dataset=dataset,
+                owner=user,
+                name='model1',
+                display_name='Model 1',
+                algorithm_type=TrainedModel.AlgorithmType.LOGISTIC_REGRESSION,
+                task_type=TrainingJob.TaskType.CLASSIFICATION,
+                target_column='target',
+                is_best=True,
+            ),
+            TrainedModel(
+                training_job=training_job,
+                dataset=dataset,
+                owner=user,
+                name='model2',
+                display_name='Model 2',
+                algorithm_type=TrainedModel.AlgorithmType.RANDOM_FOREST,
+                task_type=TrainingJob.TaskType.CLASSIFICATION,
+                target_column='target',
+                is_best=False,
+            ),
+        ])
 
         assert model1.is_best is True
         assert model2.is_best is False
 
-    def test_trained_model_model_size_display(self, user):
-        """Test model_size_display property."""
-        csv_content = b'col1,col2,target\n1,2,0'
-        file = SimpleUploadedFile('test.csv', csv_content, content_type='text/csv')
-
-        dataset = Dataset.objects.create(
-            owner=user,
-            name='Test',
-            file=file,
-            original_filename='test.csv',
-            file_type='csv',
-            file_size=len(csv_content),
-        )
-
-        job = TrainingJob.objects.create(
-            dataset=dataset,
-            owner=user,
-            target_column='target',
-        )
+    def test_trained_model_large_preprocessing_params_offloaded(
+        self, user, dataset, training_job, settings, tmp_path
+    ):
+        """Test large preprocessing params are stored in a file and resolved lazily."""
+        settings.MEDIA_ROOT = tmp_path
 
-        model = TrainedModel.objects.create(
-            training_job=job,
+        model = TrainedModel(
+            training_job=training_job,
             dataset=dataset,
             owner=user,
             name='random_forest',
@@ -383,7 +161,18 @@ class TestTrainedModelModel:
             algorithm_type=TrainedModel.AlgorithmType.RANDOM_FOREST,
             task_type=TrainingJob.TaskType.CLASSIFICATION,
             target_column='target',
-            model_size=1024 * 1024,  # 1MB
         )
+        small_params = {'numeric_cols': ['col1']}
+        model.set_preprocessing_params(small_params)
+        assert model.preprocessing_params == small_params
+        assert not model.preprocessing_params_file
+
+        large_params = {'feature_names_out': [f'cat__city_{i}' for i in range(2000)]}
+        model.set_preprocessing_params(large_params)
+        model.save()
 
-        assert 'MB' in model.model_size_display
+        model = TrainedModel.objects.get(pk=model.pk)
+        assert '__ref__' in model.preprocessing_params
+        assert 'sha256' in model.preprocessing_params
+        assert model.preprocessing_params_file
+        assert model.resolved_preprocessing_params == large_params
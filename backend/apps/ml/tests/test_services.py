@@ -2,27 +2,88 @@
 Tests for ML services.
 """
 
+import io
+from unittest.mock import patch
+
+import joblib
 import numpy as np
 import pandas as pd
 import pytest
+from sklearn.compose import ColumnTransformer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from sklearn.svm import SVC, SVR
+
+from apps.core.exceptions import TrainingError
+from apps.ml.models import TrainedModel, TrainingJob
+from apps.ml.services import ModelEvaluatorService, ModelTrainerService
+from apps.ml.services.trainer import ONNX_EXPORT_AVAILABLE
+
+
+@pytest.fixture(scope='session')
+def binary_split():
+    """Seeded two-feature binary classification split, shared read-only."""
+    X = np.random.default_rng(42).standard_normal((50, 2))
+    X_train = pd.DataFrame(X[:30], columns=['feature1', 'feature2'])
+    y_train = np.array([0] * 15 + [1] * 15)
+
+    X_test = pd.DataFrame(X[30:], columns=['feature1', 'feature2'])
+    y_test = np.array([0] * 10 + [1] * 10)
+    return X_train, y_train, X_test, y_test
+
+
+@pytest.fixture(scope='session')
+def binary_metrics():
+    """Metrics for one imperfect binary prediction, shared read-only."""
+    y_true = np.array([0, 1, 0, 1, 0, 1])
+    y_pred = np.array([0, 1, 0, 0, 1, 1])
+    return ModelEvaluatorService().evaluate(
+        y_true, y_pred,
+        TrainingJob.TaskType.CLASSIFICATION
+    )
+
+
+@pytest.fixture
+def csv_training_job(training_job):
+    """
+    Return a factory attaching a small seeded CSV to the training job's dataset.
+
+    For classification, ``rare_rows`` trailing rows are relabelled into a
+    third class, e.g. to leave cross-validation folds short of a class.
+    """
+    def make(task_type, rows=120, rare_rows=0):
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({
+            'feature1': rng.standard_normal(rows),
+            'feature2': rng.standard_normal(rows),
+            'category': rng.choice(['A', 'B', 'C'], rows),
+        })
+        if task_type == TrainingJob.TaskType.CLASSIFICATION:
+            df['target'] = (df['feature1'] + (df['category'] == 'A') > 0.3).astype(int)
+            if rare_rows:
+                df.loc[df.index[-rare_rows:], 'target'] = 2
+        else:
+            df['target'] = df['feature1'] * 3 + rng.standard_normal(rows)
 
-from apps.ml.models import TrainingJob
-from apps.ml.services import ModelEvaluatorService
+        content = df.to_csv(index=False).encode()
+        dataset = training_job.dataset
+        dataset.file.save('data.csv', ContentFile(content), save=False)
+        dataset.file_size = len(content)
+        dataset.save()
+        return training_job
+
+    return make
 
 
 class TestModelEvaluatorService:
     """Tests for ModelEvaluatorService."""
 
-    def test_evaluate_classification(self):
+    def test_evaluate_classification(self, binary_metrics):
         """Test evaluating classification predictions."""
-        y_true = np.array([0, 1, 0, 1, 0, 1, 0, 1])
-        y_pred = np.array([0, 1, 0, 0, 0, 1, 1, 1])
-
-        evaluator = ModelEvaluatorService()
-        metrics = evaluator.evaluate(
-            y_true, y_pred,
-            TrainingJob.TaskType.CLASSIFICATION
-        )
+        metrics = binary_metrics
 
         assert 'accuracy' in metrics
         assert 'precision' in metrics
@@ -126,6 +187,40 @@ class TestModelEvaluatorService:
         assert ranked[0]['is_best'] is True
         assert ranked[0]['rank'] == 1
 
+    @pytest.mark.django_db
+    def test_rank_trained_models_in_database(self, user, dataset):
+        """Test ranking persisted models flags the best one in the database."""
+        job = TrainingJob.objects.create(
+            dataset=dataset,
+            owner=user,
+            target_column='target',
+            task_type=TrainingJob.TaskType.REGRESSION,
+        )
+        TrainedModel.objects.bulk_create([
+            TrainedModel(
+                training_job=job,
+                dataset=dataset,
+                owner=user,
+                name=name,
+                display_name=name,
+                algorithm_type=TrainedModel.AlgorithmType.RANDOM_FOREST,
+                task_type=TrainingJob.TaskType.REGRESSION,
+                target_column='target',
+                metrics={'rmse': rmse},
+            )
+            for name, rmse in [('model1', 5.5), ('model2', 3.2), ('model3', 7.1)]
+        ])
+
+        evaluator = ModelEvaluatorService()
+        ranked = evaluator.rank_trained_models(job)
+
+        assert [m['name'] for m in ranked] == ['model2', 'model1', 'model3']
+        assert [m['rank'] for m in ranked] == [1, 2, 3]
+        assert ranked[0]['is_best'] is True
+        assert list(
+            TrainedModel.objects.filter(training_job=job, is_best=True).values_list('name', flat=True)
+        ) == ['model2']
+
     def test_classification_perfect_predictions(self):
         """Test classification with perfect predictions."""
         y_true = np.array([0, 1, 0, 1, 0, 1])
@@ -156,18 +251,9 @@ class TestModelEvaluatorService:
         assert metrics['mae'] == 0.0
         assert metrics['r2'] == 1.0
 
-    def test_classification_confusion_matrix_shape(self):
+    def test_classification_confusion_matrix_shape(self, binary_metrics):
         """Test confusion matrix shape for binary classification."""
-        y_true = np.array([0, 1, 0, 1, 0, 1])
-        y_pred = np.array([0, 1, 0, 0, 1, 1])
-
-        evaluator = ModelEvaluatorService()
-        metrics = evaluator.evaluate(
-            y_true, y_pred,
-            TrainingJob.TaskType.CLASSIFICATION
-        )
-
-        cm = metrics['confusion_matrix']
+        cm = binary_metrics['confusion_matrix']
         assert len(cm) == 2  # 2x2 matrix for binary
         assert len(cm[0]) == 2
 
@@ -185,21 +271,12 @@ class TestModelEvaluatorService:
         # MAPE should not be computed (would cause division by zero)
         assert 'mape' not in metrics or metrics.get('mape') is None
 
-    def test_confusion_matrix_has_labels(self):
+    def test_confusion_matrix_has_labels(self, binary_metrics):
         """Test confusion matrix includes class labels."""
-        y_true = np.array([0, 1, 0, 1, 0, 1])
-        y_pred = np.array([0, 1, 0, 0, 1, 1])
-
-        evaluator = ModelEvaluatorService()
-        metrics = evaluator.evaluate(
-            y_true, y_pred,
-            TrainingJob.TaskType.CLASSIFICATION
-        )
-
         # Confusion matrix labels should be present
-        assert 'confusion_matrix_labels' in metrics
-        assert len(metrics['confusion_matrix_labels']) == 2
-        assert metrics['confusion_matrix_labels'] == ['0', '1']
+        assert 'confusion_matrix_labels' in binary_metrics
+        assert len(binary_metrics['confusion_matrix_labels']) == 2
+        assert binary_metrics['confusion_matrix_labels'] == ['0', '1']
 
     def test_multiclass_confusion_matrix_has_labels(self):
         """Test confusion matrix labels for multiclass."""
@@ -217,25 +294,10 @@ class TestModelEvaluatorService:
         assert len(metrics['confusion_matrix_labels']) == 3
         assert metrics['confusion_matrix_labels'] == ['0', '1', '2']
 
-    def test_roc_curve_data_with_pipeline(self):
+    def test_roc_curve_data_with_pipeline(self, binary_split):
         """Test ROC curve data is generated when pipeline with predict_proba is provided."""
-        from sklearn.linear_model import LogisticRegression
-        from sklearn.pipeline import Pipeline
-        from sklearn.preprocessing import StandardScaler
-
         # Create a simple dataset
-        np.random.seed(42)
-        X_train = pd.DataFrame({
-            'feature1': np.random.randn(100),
-            'feature2': np.random.randn(100)
-        })
-        y_train = np.array([0] * 50 + [1] * 50)
-
-        X_test = pd.DataFrame({
-            'feature1': np.random.randn(20),
-            'feature2': np.random.randn(20)
-        })
-        y_test = np.array([0] * 10 + [1] * 10)
+        X_train, y_train, X_test, y_test = binary_split
 
         # Create and fit pipeline
         pipeline = Pipeline([
@@ -263,31 +325,83 @@ class TestModelEvaluatorService:
         assert 'thresholds' in metrics['roc_curve']
 
         # Check that ROC curve data is valid
-        assert len(metrics['roc_curve']['fpr']) == len(metrics['roc_curve']['tpr'])
-        assert all(0 <= x <= 1 for x in metrics['roc_curve']['fpr'])
-        assert all(0 <= x <= 1 for x in metrics['roc_curve']['tpr'])
+        fpr = np.asarray(metrics['roc_curve']['fpr'])
+        tpr = np.asarray(metrics['roc_curve']['tpr'])
+        assert fpr.shape == tpr.shape
+        assert np.all((fpr >= 0) & (fpr <= 1))
+        assert np.all((tpr >= 0) & (tpr <= 1))
 
         # ROC AUC should be between 0 and 1
         assert 0 <= metrics['roc_auc'] <= 1
 
+    def test_roc_curve_data_with_bare_estimator(self):
+        """Test ROC curve data is generated for an estimator on preprocessed input."""
+        rng = np.random.default_rng(42)
+        X_train = rng.standard_normal((100, 2))
+        y_train = np.array([0] * 50 + [1] * 50)
+        X_test = rng.standard_normal((20, 2))
+        y_test = np.array([0] * 10 + [1] * 10)
+
+        model = LogisticRegression().fit(X_train, y_train)
+
+        evaluator = ModelEvaluatorService()
+        metrics = evaluator.evaluate(
+            y_test,
+            model.predict(X_test),
+            TrainingJob.TaskType.CLASSIFICATION,
+            pipeline=model,
+            X_test=X_test
+        )
+
+        assert 'roc_auc' in metrics
+        assert 'roc_curve' in metrics
+
+    def test_roc_curve_from_precomputed_probabilities(self, binary_split):
+        """Test precomputed probabilities give the same ROC data as the pipeline."""
+        X_train, y_train, X_test, y_test = binary_split
+        model = LogisticRegression().fit(X_train, y_train)
+        y_pred = model.predict(X_test)
+
+        evaluator = ModelEvaluatorService()
+        expected = evaluator.evaluate(
+            y_test, y_pred, TrainingJob.TaskType.CLASSIFICATION,
+            pipeline=model, X_test=X_test
+        )
+        y_proba = model.predict_proba(X_test)
+        with patch.object(model, 'predict_proba') as predict_proba:
+            metrics = evaluator.evaluate(
+                y_test, y_pred, TrainingJob.TaskType.CLASSIFICATION,
+                pipeline=model, X_test=X_test, y_proba=y_proba
+            )
+
+        predict_proba.assert_not_called()
+        assert metrics['roc_auc'] == expected['roc_auc']
+        assert metrics['roc_curve'] == expected['roc_curve']
+
+    def test_simplify_curve_keeps_shape_within_max_points(self):
+        """Test ROC downsampling keeps endpoints and the curve's knee."""
+        fpr = np.linspace(0, 1, 1001)
+        tpr = np.minimum(fpr * 10, 1.0)
+
+        indices = ModelEvaluatorService._simplify_curve(
+            fpr, tpr, max_points=200, tolerance=1e-6
+        )
+
+        assert len(indices) <= 200
+        assert indices[0] == 0
+        assert indices[-1] == 1000
+        # The knee at fpr=0.1 is kept and the straight segments collapse
+        assert 100 in indices
+        assert len(indices) == 3
+
     def test_roc_curve_not_computed_for_multiclass(self):
         """Test ROC curve is not computed for multiclass classification."""
-        from sklearn.linear_model import LogisticRegression
-        from sklearn.pipeline import Pipeline
-        from sklearn.preprocessing import StandardScaler
-
         # Create a multiclass dataset
-        np.random.seed(42)
-        X_train = pd.DataFrame({
-            'feature1': np.random.randn(150),
-            'feature2': np.random.randn(150)
-        })
-        y_train = np.array([0] * 50 + [1] * 50 + [2] * 50)
+        X = np.random.default_rng(42).standard_normal((60, 2))
+        X_train = pd.DataFrame(X[:30], columns=['feature1', 'feature2'])
+        y_train = np.array([0] * 10 + [1] * 10 + [2] * 10)
 
-        X_test = pd.DataFrame({
-            'feature1': np.random.randn(30),
-            'feature2': np.random.randn(30)
-        })
+        X_test = pd.DataFrame(X[30:], columns=['feature1', 'feature2'])
         y_test = np.array([0] * 10 + [1] * 10 + [2] * 10)
 
         # Create and fit pipeline
@@ -329,30 +443,16 @@ class TestModelEvaluatorService:
 class TestSVMSupport:
     """Tests for SVM model support."""
 
-    def test_svc_training_and_evaluation(self):
+    def test_svc_training_and_evaluation(self, binary_split):
         """Test SVC classifier trains and evaluates successfully."""
-        from sklearn.svm import SVC
-        from sklearn.pipeline import Pipeline
-        from sklearn.preprocessing import StandardScaler
-
         # Create a simple binary classification dataset
-        np.random.seed(42)
-        X_train = pd.DataFrame({
-            'feature1': np.random.randn(100),
-            'feature2': np.random.randn(100)
-        })
-        y_train = np.array([0] * 50 + [1] * 50)
+        X_train, y_train, X_test, y_test = binary_split
 
-        X_test = pd.DataFrame({
-            'feature1': np.random.randn(20),
-            'feature2': np.random.randn(20)
-        })
-        y_test = np.array([0] * 10 + [1] * 10)
-
-        # Create SVC pipeline with probability=True
+        # probability=True would add an internal cross-validated Platt fit,
+        # which these structural assertions don't need
         pipeline = Pipeline([
             ('preprocessor', StandardScaler()),
-            ('model', SVC(kernel='rbf', probability=True, max_iter=5000, random_state=42))
+            ('model', SVC(kernel='rbf', max_iter=5000, random_state=42))
         ])
         pipeline.fit(X_train, y_train)
 
@@ -372,29 +472,43 @@ class TestSVMSupport:
         assert 'f1_weighted' in metrics
         assert 'confusion_matrix' in metrics
 
-        # SVC with probability=True should have ROC curve
+        # Without predict_proba there is no ROC curve
+        assert 'roc_curve' not in metrics
+
+    def test_svc_with_probabilities_has_roc_curve(self, binary_split):
+        """Test SVC with probability estimates produces ROC curve data."""
+        X_train, y_train, X_test, y_test = binary_split
+
+        # Linear kernel keeps the Platt scaling fit cheap on the small split
+        pipeline = Pipeline([
+            ('preprocessor', StandardScaler()),
+            ('model', SVC(kernel='linear', probability=True, random_state=42))
+        ])
+        pipeline.fit(X_train, y_train)
+
+        evaluator = ModelEvaluatorService()
+        metrics = evaluator.evaluate(
+            y_test,
+            pipeline.predict(X_test),
+            TrainingJob.TaskType.CLASSIFICATION,
+            y_proba=pipeline.predict_proba(X_test)
+        )
+
         assert 'roc_auc' in metrics
         assert 'roc_curve' in metrics
 
     def test_svr_training_and_evaluation(self):
         """Test SVR regressor trains and evaluates successfully."""
-        from sklearn.svm import SVR
-        from sklearn.pipeline import Pipeline
-        from sklearn.preprocessing import StandardScaler
-
         # Create a simple regression dataset
-        np.random.seed(42)
-        X_train = pd.DataFrame({
-            'feature1': np.random.randn(100),
-            'feature2': np.random.randn(100)
-        })
-        y_train = X_train['feature1'] * 2 + X_train['feature2'] + np.random.randn(100) * 0.1
+        rng = np.random.default_rng(42)
+        X = rng.standard_normal((50, 2))
+        y = X @ np.array([2.0, 1.0]) + rng.standard_normal(50) * 0.1
 
-        X_test = pd.DataFrame({
-            'feature1': np.random.randn(20),
-            'feature2': np.random.randn(20)
-        })
-        y_test = X_test['feature1'] * 2 + X_test['feature2'] + np.random.randn(20) * 0.1
+        X_train = pd.DataFrame(X[:30], columns=['feature1', 'feature2'])
+        y_train = y[:30]
+
+        X_test = pd.DataFrame(X[30:], columns=['feature1', 'feature2'])
+        y_test = y[30:]
 
         # Create SVR pipeline
         pipeline = Pipeline([
@@ -421,20 +535,9 @@ class TestSVMSupport:
         # SVR should perform reasonably on this simple dataset
         assert metrics['r2'] > 0.5
 
-    def test_svm_feature_importance_linear_kernel(self):
+    def test_svm_feature_importance_linear_kernel(self, binary_split):
         """Test feature importance extraction for linear kernel SVM."""
-        from sklearn.svm import SVC
-        from sklearn.pipeline import Pipeline
-        from sklearn.compose import ColumnTransformer
-        from sklearn.preprocessing import StandardScaler
-
-        # Create a simple dataset
-        np.random.seed(42)
-        X_train = pd.DataFrame({
-            'feature1': np.random.randn(100),
-            'feature2': np.random.randn(100)
-        })
-        y_train = np.array([0] * 50 + [1] * 50)
+        X_train, y_train, _, _ = binary_split
 
         # Create preprocessing pipeline
         preprocessor = ColumnTransformer(
@@ -446,7 +549,7 @@ class TestSVMSupport:
         # Create SVC pipeline with linear kernel (has coef_)
         pipeline = Pipeline([
             ('preprocessor', preprocessor),
-            ('model', SVC(kernel='linear', probability=True, random_state=42))
+            ('model', SVC(kernel='linear', random_state=42))
         ])
         pipeline.fit(X_train, y_train)
 
@@ -464,19 +567,130 @@ class TestSVMSupport:
         assert len(importance_dict) == 2
         assert all(v >= 0 for v in importance_dict.values())
 
-    def test_svm_no_feature_importance_rbf_kernel(self):
+    def test_svm_no_feature_importance_rbf_kernel(self, binary_split):
         """Test that RBF kernel SVM has no direct feature importance."""
-        from sklearn.svm import SVC
-
-        # Create a simple dataset
-        np.random.seed(42)
-        X_train = np.random.randn(100, 2)
-        y_train = np.array([0] * 50 + [1] * 50)
+        X_train, y_train, _, _ = binary_split
 
         # Train SVC with RBF kernel
-        model = SVC(kernel='rbf', probability=True, random_state=42)
+        model = SVC(kernel='rbf', random_state=42)
         model.fit(X_train, y_train)
 
         # RBF kernel SVM should not have feature_importances_ or coef_
         assert not hasattr(model, 'feature_importances_')
         assert not hasattr(model, 'coef_')
+
+
+class TestModelTrainerService:
+    """Tests for ModelTrainerService."""
+
+    @pytest.mark.django_db
+    def test_update_status_reports_progress(self, training_job):
+        """Test status updates are persisted and streamed to the progress callback."""
+        reported = []
+
+        trainer = ModelTrainerService(
+            training_job, progress_callback=lambda step, progress: reported.append((step, progress))
+        )
+        trainer._update_status(TrainingJob.Status.RUNNING, 'Loading data', 10)
+
+        training_job.refresh_from_db()
+        assert training_job.current_step == 'Loading data'
+        assert training_job.progress == 10
+        assert reported == [('Loading data', 10)]
+
+    @pytest.mark.django_db
+    def test_update_status_throttles_rapid_progress(self, training_job):
+        """Test rapid ticks within one status skip the database write."""
+        trainer = ModelTrainerService(training_job)
+        trainer._update_status(TrainingJob.Status.RUNNING, 'Training models', 30)
+        trainer._update_status(TrainingJob.Status.RUNNING, 'Trained Random Forest', 40)
+
+        training_job.refresh_from_db()
+        assert training_job.progress == 30
+
+        # A status change is always written
+        trainer._update_status(TrainingJob.Status.ERROR, 'Failed', 40)
+        training_job.refresh_from_db()
+        assert training_job.status == TrainingJob.Status.ERROR
+        assert training_job.progress == 40
+
+    @pytest.mark.django_db
+    def test_serialized_model_stores_class_labels(self, training_job):
+        """Test classifier labels are saved as strings alongside the pipeline."""
+        pipeline = Pipeline([
+            ('preprocessor', StandardScaler()),
+            ('model', LogisticRegression()),
+        ]).fit([[0.0], [1.0], [2.0], [3.0]], [1, 2, 1, 2])
+
+        trainer = ModelTrainerService(training_job)
+        model_data = joblib.load(io.BytesIO(trainer._serialize_model(pipeline)))
+
+        assert model_data['class_labels'] == ['1', '2']
+
+    @pytest.mark.slow
+    @pytest.mark.django_db
+    @pytest.mark.parametrize('task_type,onnx_models', [
+        (TrainingJob.TaskType.CLASSIFICATION, {'logistic_regression', 'svm'}),
+        (TrainingJob.TaskType.REGRESSION, set()),
+    ])
+    def test_train_end_to_end(self, csv_training_job, task_type, onnx_models):
+        """Test a full training run stores every candidate and picks one best model."""
+        job = csv_training_job(task_type)
+
+        ModelTrainerService(job).train()
+
+        job.refresh_from_db()
+        assert job.status == TrainingJob.Status.COMPLETED
+        assert job.task_type == task_type
+
+        models = TrainedModel.objects.filter(training_job=job)
+        assert models.filter(is_best=True).count() == 1
+        assert job.best_model == models.get(is_best=True)
+        for model in models:
+            assert model.model_file
+            assert default_storage.exists(model.model_file.name)
+
+        # skl2onnx is optional; without it no candidate is exported
+        exported = {model.name for model in models if model.onnx_file}
+        assert exported == (onnx_models if ONNX_EXPORT_AVAILABLE else set())
+        for model in models:
+            if model.onnx_file:
+                assert default_storage.exists(model.onnx_file.name)
+
+    @pytest.mark.slow
+    @pytest.mark.django_db
+    def test_train_with_rare_class(self, csv_training_job):
+        """Test a class too small for every CV fold leaves no NaN scores to insert."""
+        job = csv_training_job(TrainingJob.TaskType.CLASSIFICATION, rows=60, rare_rows=2)
+
+        ModelTrainerService(job).train()
+
+        job.refresh_from_db()
+        assert job.status == TrainingJob.Status.COMPLETED
+        models = TrainedModel.objects.filter(training_job=job)
+        # Early stopping must not carve a validation split out of the rare class
+        folds = {model.name: len(model.cross_val_scores) for model in models}
+        assert folds['gradient_boosting'] == folds['logistic_regression']
+        for model in models:
+            assert model.cross_val_scores
+            assert np.isfinite(model.cross_val_scores).all()
+
+    @pytest.mark.slow
+    @pytest.mark.django_db
+    def test_failed_insert_removes_stored_artifacts(self, csv_training_job):
+        """Test model files are deleted when the trained model rows fail to insert."""
+        job = csv_training_job(TrainingJob.TaskType.REGRESSION)
+        stored = []
+
+        def failing_bulk_create(objs, *args, **kwargs):
+            for obj in objs:
+                stored.extend(f.name for f in (obj.model_file, obj.onnx_file) if f)
+            raise RuntimeError('insert failed')
+
+        with patch.object(TrainedModel.objects, 'bulk_create', side_effect=failing_bulk_create):
+            with pytest.raises(TrainingError):
+                ModelTrainerService(job).train()
+
+        assert stored
+        assert not any(default_storage.exists(name) for name in stored)
+        assert not TrainedModel.objects.filter(training_job=job).exists()
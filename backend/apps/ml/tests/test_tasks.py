@@ -109,3 +109,57 @@ class TestTrainModelsTask:
             job.refresh_from_db()
             assert job.status == TrainingJob.Status.ERROR
             assert 'Training failed' in job.error_message
+
+
+class TestCleanupModelFile:
+    """Tests for model file cleanup on delete."""
+
+    @pytest.mark.django_db
+    def test_delete_queues_file_cleanup_on_commit(
+        self, user, settings, tmp_path, django_capture_on_commit_callbacks
+    ):
+        """Test that deleting a trained model queues the storage cleanup."""
+        settings.MEDIA_ROOT = tmp_path
+        from django.core.files.base import ContentFile
+        from apps.datasets.models import Dataset
+        from apps.ml.models import TrainedModel, TrainingJob
+
+        dataset = Dataset.objects.create(
+            owner=user,
+            name='Test',
+            original_filename='test.csv',
+            file_type='csv',
+            file_size=0,
+        )
+        job = TrainingJob.objects.create(
+            dataset=dataset,
+            owner=user,
+            target_column='target',
+        )
+        model = TrainedModel.objects.create(
+            training_job=job,
+            dataset=dataset,
+            owner=user,
+            name='random_forest',
+            display_name='Random Forest',
+            algorithm_type=TrainedModel.AlgorithmType.RANDOM_FOREST,
+            task_type=TrainingJob.TaskType.REGRESSION,
+            target_column='target',
+        )
+        model.model_file.save('model.joblib', ContentFile(b'data'), save=True)
+        file_name = model.model_file.name
+
+        with patch('apps.ml.tasks.cleanup_model_file_task.delay') as mock_delay:
+            with django_capture_on_commit_callbacks(execute=True):
+                model.delete()
+
+        mock_delay.assert_called_once_with(file_name)
+
+    def test_cleanup_task_deletes_from_storage(self):
+        """Test that the cleanup task removes the file from storage."""
+        from apps.ml.tasks import cleanup_model_file_task
+
+        with patch('django.core.files.storage.default_storage.delete') as mock_delete:
+            cleanup_model_file_task('models/model.joblib')
+
+        mock_delete.assert_called_once_with('models/model.joblib')
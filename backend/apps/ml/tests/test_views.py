@@ -0,0 +1,187 @@
+"""
+Tests for ML views.
+"""
+
+from unittest.mock import patch
+
+import pytest
+from celery.exceptions import TimeoutError as CeleryTimeoutError
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.core.files import DOWNLOAD_BLOCK_SIZE
+from apps.datasets.models import Dataset
+from apps.ml.models import TrainedModel, TrainingJob
+from apps.ml.views import (
+    DatasetModelsView,
+    TrainedModelViewSet,
+    TrainingJobViewSet,
+    TriggerTrainingView,
+)
+
+
+def add_models(training_job, count):
+    """Bulk-create trained models on a job and mark the first one best."""
+    models = TrainedModel.objects.bulk_create(
+        TrainedModel(
+            training_job=training_job,
+            dataset=training_job.dataset,
+            owner=training_job.owner,
+            name=f'model_{i}',
+            display_name=f'Model {i}',
+            algorithm_type=TrainedModel.AlgorithmType.RANDOM_FOREST,
+            task_type=training_job.task_type,
+            target_column='target',
+            shap_values={'shap_importance': {'col1': 1.0}},
+        )
+        for i in range(count)
+    )
+    training_job.best_model = models[0]
+    training_job.save(update_fields=['best_model'])
+
+
+def get(view, user, **kwargs):
+    """Call a view with an authenticated GET; return (response, query count)."""
+    request = APIRequestFactory().get('/')
+    force_authenticate(request, user=user)
+    with CaptureQueriesContext(connection) as queries:
+        response = view(request, **kwargs)
+        response.render()
+    assert response.status_code == status.HTTP_200_OK
+    return response, len(queries)
+
+
+@pytest.mark.django_db
+class TestQueryCounts:
+    """Tests that list and detail endpoints don't query once per model."""
+
+    def test_job_detail_queries_do_not_grow_with_models(self, training_job):
+        """Test nested models on a job detail are loaded in a fixed number of queries."""
+        view = TrainingJobViewSet.as_view({'get': 'retrieve'})
+        add_models(training_job, 2)
+        _, baseline = get(view, training_job.owner, pk=training_job.id)
+
+        add_models(training_job, 3)
+        response, queries = get(view, training_job.owner, pk=training_job.id)
+
+        assert queries == baseline
+        assert len(response.data['models']) == 5
+        assert response.data['best_model']['dataset_name'] == training_job.dataset.name
+
+    def test_model_list_queries_do_not_grow_with_models(self, training_job):
+        """Test the model list loads datasets without a query per row."""
+        view = TrainedModelViewSet.as_view({'get': 'list'})
+        add_models(training_job, 2)
+        _, baseline = get(view, training_job.owner)
+
+        add_models(training_job, 3)
+        _, queries = get(view, training_job.owner)
+
+        assert queries == baseline
+
+    def test_dataset_models_counts_without_extra_query(self, training_job):
+        """Test the dataset's best models are counted from the fetched rows."""
+        view = DatasetModelsView.as_view()
+        add_models(training_job, 1)
+        TrainedModel.objects.update(is_best=True)
+        dataset_id = training_job.dataset_id
+
+        response, queries = get(view, training_job.owner, dataset_id=dataset_id)
+
+        assert response.data['count'] == 1
+        # Dataset ownership check and the models themselves
+        assert queries == 2
+
+
+@pytest.mark.django_db
+class TestModelDownload:
+    """Tests for the trained model download endpoint."""
+
+    @pytest.fixture
+    def stored_model(self, training_job):
+        """Create a trained model with a small file in storage."""
+        add_models(training_job, 1)
+        model = TrainedModel.objects.get(training_job=training_job)
+        model.model_file.save('model.joblib', ContentFile(b'model bytes'))
+        return model
+
+    def test_download_streams_file(self, stored_model):
+        """Test the model file is streamed as an attachment by default."""
+        view = TrainedModelViewSet.as_view({'get': 'download'})
+        request = APIRequestFactory().get('/')
+        force_authenticate(request, user=stored_model.owner)
+
+        response = view(request, pk=stored_model.id)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Length'] == str(len(b'model bytes'))
+        assert response.block_size == DOWNLOAD_BLOCK_SIZE
+        assert b''.join(response.streaming_content) == b'model bytes'
+        assert 'attachment' in response['Content-Disposition']
+
+    def test_download_hands_off_to_nginx(self, stored_model, settings):
+        """Test an accel-redirect prefix leaves sending the file to nginx."""
+        settings.MEDIA_ACCEL_REDIRECT_PREFIX = '/protected/'
+        view = TrainedModelViewSet.as_view({'get': 'download'})
+        request = APIRequestFactory().get('/')
+        force_authenticate(request, user=stored_model.owner)
+
+        response = view(request, pk=stored_model.id)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response['X-Accel-Redirect'] == f'/protected/{stored_model.model_file.name}'
+        assert 'attachment' in response['Content-Disposition']
+        assert response.content == b''
+
+
+@pytest.mark.django_db
+class TestTriggerTraining:
+    """Tests that training requests hand the work to Celery."""
+
+    @pytest.fixture
+    def post(self, dataset):
+        """Return a function that POSTs a training request for the dataset."""
+        dataset.status = Dataset.Status.READY
+        dataset.save(update_fields=['status'])
+
+        def post(query=''):
+            request = APIRequestFactory().post(
+                f'/{query}', {'dataset_id': str(dataset.id), 'target_column': 'target'},
+                format='json'
+            )
+            force_authenticate(request, user=dataset.owner)
+            return TriggerTrainingView.as_view()(request)
+        return post
+
+    def test_async_request_returns_once_queued(self, post):
+        """Test an async request is answered without waiting for the task."""
+        with patch('apps.ml.tasks.train_models_task.delay') as delay:
+            response = post('?async=true')
+
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        delay.assert_called_once_with(response.data['job_id'])
+        delay.return_value.get.assert_not_called()
+
+    def test_sync_request_waits_for_worker(self, post):
+        """Test a sync request returns the job the worker completed."""
+        def complete(timeout):
+            TrainingJob.objects.update(status=TrainingJob.Status.COMPLETED)
+
+        with patch('apps.ml.tasks.train_models_task.delay') as delay:
+            delay.return_value.get.side_effect = complete
+            response = post()
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data['status'] == TrainingJob.Status.COMPLETED
+
+    def test_sync_request_falls_back_to_queued_on_timeout(self, post):
+        """Test a sync request that outlasts the wait gets the queued response."""
+        with patch('apps.ml.tasks.train_models_task.delay') as delay:
+            delay.return_value.get.side_effect = CeleryTimeoutError()
+            response = post()
+
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert TrainingJob.objects.get(id=response.data['job_id']).status == TrainingJob.Status.PENDING
@@ -4,7 +4,9 @@ Views for the ML app.
 
 import logging
 
-from django.http import FileResponse
+from celery.exceptions import TimeoutError as CeleryTimeoutError
+from django.conf import settings
+from django.db.models import Prefetch
 from rest_framework import permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -12,6 +14,7 @@ from rest_framework.views import APIView
 from rest_framework.viewsets import ReadOnlyModelViewSet
 
 from apps.core.exceptions import DatasetNotFoundError, ModelNotFoundError, TrainingError
+from apps.core.files import download_response
 from apps.datasets.models import Dataset
 
 from .models import TrainedModel, TrainingJob
@@ -22,10 +25,25 @@ from .serializers import (
     TrainingJobDetailSerializer,
     TrainingJobListSerializer,
 )
-from .services import ModelTrainerService
 
 logger = logging.getLogger(__name__)
 
+# Large JSON columns that TrainedModelListSerializer never reads
+TRAINED_MODEL_DETAIL_FIELDS = (
+    'feature_columns',
+    'input_schema',
+    'preprocessing_params',
+    'feature_importance',
+    'cross_val_scores',
+    'shap_values',
+    'hyperparameters',
+)
+
+
+def trained_model_list_queryset():
+    """Trained models with what TrainedModelListSerializer reads, and no more."""
+    return TrainedModel.objects.select_related('dataset').defer(*TRAINED_MODEL_DETAIL_FIELDS)
+
 
 class TrainingJobViewSet(ReadOnlyModelViewSet):
     """
@@ -40,9 +58,19 @@ class TrainingJobViewSet(ReadOnlyModelViewSet):
 
     def get_queryset(self):
         """Return training jobs owned by the current user."""
-        return TrainingJob.objects.filter(
+        queryset = TrainingJob.objects.filter(
             owner=self.request.user
-        ).select_related('dataset', 'best_model')
+        ).select_related('dataset')
+
+        if self.action == 'list':
+            return queryset
+
+        # Nested models each show their dataset's name; load them all in
+        # one query instead of one per model
+        return queryset.prefetch_related(
+            Prefetch('models', queryset=trained_model_list_queryset()),
+            Prefetch('best_model', queryset=trained_model_list_queryset()),
+        )
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -64,6 +92,9 @@ class TrainedModelViewSet(ReadOnlyModelViewSet):
 
     def get_queryset(self):
         """Return trained models owned by the current user."""
+        if self.action == 'list':
+            return trained_model_list_queryset().filter(owner=self.request.user)
+
         return TrainedModel.objects.filter(
             owner=self.request.user
         ).select_related('dataset', 'training_job')
@@ -105,12 +136,7 @@ class TrainedModelViewSet(ReadOnlyModelViewSet):
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-            response = FileResponse(
-                model.model_file.open('rb'),
-                as_attachment=True,
-                filename=f'{model.name}_{model.id}.joblib'
-            )
-            return response
+            return download_response(model.model_file, f'{model.name}_{model.id}.joblib')
 
         except Exception as e:
             logger.error(f'Failed to download model: {str(e)}')
@@ -160,7 +186,8 @@ class TriggerTrainingView(APIView):
     POST /api/v1/ml/train/
 
     Query Parameters:
-        async: If 'true', run training as background task (returns 202 Accepted)
+        async: If 'true', return 202 Accepted as soon as training is queued;
+            otherwise wait for it to finish (201 Created) or time out (202)
     """
 
     permission_classes = [permissions.IsAuthenticated]
@@ -202,44 +229,42 @@ class TriggerTrainingView(APIView):
             task_type_auto_detected=not bool(task_type),
         )
 
-        if run_async:
-            # Dispatch async task
-            from .tasks import train_models_task
-            train_models_task.delay(str(job.id))
+        # Training always runs on a Celery worker, never on the request thread
+        from .tasks import train_models_task
+        result = train_models_task.delay(str(job.id))
 
-            logger.info(
-                f'Async training triggered for dataset {dataset_id} by user {request.user.email}'
-            )
-
-            return Response({
-                'job_id': str(job.id),
-                'status': job.status,
-                'message': 'Training job queued. Check status at /api/v1/ml/jobs/{job_id}/',
-            }, status=status.HTTP_202_ACCEPTED)
+        logger.info(
+            f'Training triggered for dataset {dataset_id} by user {request.user.email}'
+        )
 
-        # Run training synchronously
-        try:
-            trainer = ModelTrainerService(job)
-            job = trainer.train()
+        queued = Response({
+            'job_id': str(job.id),
+            'status': job.status,
+            'message': 'Training job queued. Check status at /api/v1/ml/jobs/{job_id}/',
+        }, status=status.HTTP_202_ACCEPTED)
 
-            logger.info(
-                f'Training triggered for dataset {dataset_id} by user {request.user.email}'
-            )
+        if run_async:
+            return queued
 
-            return Response(
-                TrainingJobDetailSerializer(job).data,
-                status=status.HTTP_201_CREATED
-            )
+        # Synchronous callers wait for the worker, up to a limit below the
+        # web server's own timeout; past it they get the queued response
+        try:
+            result.get(timeout=settings.ML_SYNC_TRAINING_TIMEOUT)
+        except CeleryTimeoutError:
+            return queued
 
-        except TrainingError:
-            raise
-        except Exception as e:
-            logger.error(f'Training failed: {str(e)}')
+        job.refresh_from_db()
+        if job.status == TrainingJob.Status.ERROR:
             raise TrainingError(
                 detail='Failed to train models.',
-                meta={'error': str(e)}
+                meta={'error': job.error_message}
             )
 
+        return Response(
+            TrainingJobDetailSerializer(job).data,
+            status=status.HTTP_201_CREATED
+        )
+
 
 class DatasetModelsView(APIView):
     """
@@ -260,14 +285,15 @@ class DatasetModelsView(APIView):
         except Dataset.DoesNotExist:
             raise DatasetNotFoundError()
 
-        models = TrainedModel.objects.filter(
+        models = trained_model_list_queryset().filter(
             dataset=dataset,
             is_best=True
         ).order_by('-created_at')
 
         serializer = TrainedModelListSerializer(models, many=True)
+        results = serializer.data
 
         return Response({
-            'results': serializer.data,
-            'count': models.count(),
+            'results': results,
+            'count': len(results),
         })
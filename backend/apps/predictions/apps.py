@@ -5,3 +5,6 @@ class PredictionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.predictions'
     verbose_name = 'Predictions'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-16 00:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ml", "0007_add_onnx_file"),
+        ("predictions", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="predictionjob",
+            name="predictions_model_i_2fb494_idx",
+        ),
+        migrations.AddIndex(
+            model_name="predictionjob",
+            index=models.Index(
+                fields=["model", "-created_at"], name="predictions_model_i_aefb15_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-16 00:18
+
+import apps.core.ids
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("predictions", "0002_add_model_created_at_index"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="predictionjob",
+            name="id",
+            field=models.UUIDField(
+                default=apps.core.ids.uuid7,
+                editable=False,
+                primary_key=True,
+                serialize=False,
+            ),
+        ),
+    ]
@@ -2,11 +2,10 @@
 Models for the Predictions app.
 """
 
-import uuid
-
 from django.conf import settings
 from django.db import models
 
+from apps.core.ids import uuid7
 from apps.ml.models import TrainedModel
 
 
@@ -23,7 +22,7 @@ class PredictionJob(models.Model):
         JSON = 'json', 'JSON'
         FILE = 'file', 'File'
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     model = models.ForeignKey(
         TrainedModel,
         on_delete=models.CASCADE,
@@ -73,7 +72,7 @@ class PredictionJob(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['owner', '-created_at']),
-            models.Index(fields=['model']),
+            models.Index(fields=['model', '-created_at']),
             models.Index(fields=['status']),
         ]
 
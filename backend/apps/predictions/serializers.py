@@ -71,13 +71,8 @@ class PredictionCreateSerializer(serializers.Serializer):
         if not value:
             raise serializers.ValidationError('Data cannot be empty.')
 
-        # Check all items are dictionaries
-        for i, item in enumerate(value):
-            if not isinstance(item, dict):
-                raise serializers.ValidationError(
-                    f'Item at index {i} is not a dictionary.'
-                )
-
+        # Items are already dictionaries: the DictField child rejects
+        # anything else, keyed by index, before this method runs
         return value
 
 
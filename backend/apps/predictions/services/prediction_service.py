@@ -5,22 +5,55 @@ Handles loading trained models and running predictions.
 """
 
 import csv
+import hashlib
 import io
+import json
 import logging
-import tempfile
+import os
+from functools import lru_cache
 from typing import Any
 
 import joblib
+import numpy as np
 import pandas as pd
-from django.core.files import File
+from django.core.cache import cache
+from django.core.files.uploadedfile import TemporaryUploadedFile
 from django.utils import timezone
 
 from apps.core.exceptions import PredictionError, ValidationError
-from apps.ml.models import TrainedModel
+from apps.ml.fitting import to_dense, to_float32
+from apps.ml.models import TrainedModel, TrainingJob
 from apps.predictions.models import PredictionJob
 
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
 logger = logging.getLogger(__name__)
 
+# Loaded models kept per process. Entries are keyed on the file's path and
+# modification time, so a replaced file is reloaded rather than served stale.
+MODEL_CACHE_SIZE = 16
+
+
+@lru_cache(maxsize=MODEL_CACHE_SIZE)
+def _load_model_data(path: str, mtime: float) -> dict:
+    """Unpickle a stored model; the result is shared, so treat it as read-only."""
+    return joblib.load(path)
+
+
+@lru_cache(maxsize=MODEL_CACHE_SIZE)
+def _load_onnx_session(path: str, mtime: float):
+    """Create an ONNX inference session for a stored model."""
+    return onnxruntime.InferenceSession(path, providers=['CPUExecutionProvider'])
+
+
+def clear_model_cache() -> None:
+    """Drop every model loaded by this process."""
+    _load_model_data.cache_clear()
+    _load_onnx_session.cache_clear()
+
 
 class PredictionService:
     """
@@ -33,10 +66,47 @@ class PredictionService:
     - Output formatting
     """
 
+    # Rows transformed and predicted at a time, bounding the peak size of
+    # the preprocessed feature matrix on large batches
+    PREDICT_CHUNK_SIZE = 10_000
+
+    # File jobs keep every prediction in the output file; the job row only
+    # stores this many as a preview
+    PREDICTIONS_PREVIEW_ROWS = 100
+
+    # Results for small JSON requests are cached briefly, since dashboards
+    # and automations repeat the same request
+    RESULT_CACHE_MAX_ROWS = 100
+    RESULT_CACHE_TIMEOUT = 300
+
+    # TrainedModel fields the service never reads; callers loading a model
+    # only to predict can defer them
+    UNUSED_MODEL_FIELDS = (
+        'shap_values',
+        'feature_importance',
+        'cross_val_scores',
+        'hyperparameters',
+        'preprocessing_params',
+    )
+
+    # Longest error message stored on a failed job
+    ERROR_MESSAGE_MAX_LENGTH = 10_000
+
     def __init__(self, trained_model: TrainedModel):
         self.model = trained_model
         self.pipeline = None
         self.model_data = None
+        self.class_labels = None
+        self.onnx_session = None
+
+        # Read the schema once rather than on every validate_input call
+        input_schema = trained_model.input_schema or {}
+        self.feature_columns = list(trained_model.feature_columns)
+        self.feature_set = frozenset(self.feature_columns)
+        self.numeric_columns = [
+            col for col in self.feature_columns
+            if input_schema.get(col, {}).get('dtype') == 'numeric'
+        ]
 
     def load_model(self) -> None:
         """Load the trained model from file."""
@@ -47,8 +117,13 @@ class PredictionService:
             )
 
         try:
-            self.model_data = joblib.load(self.model.model_file.path)
+            path = self.model.model_file.path
+            self.model_data = _load_model_data(path, os.path.getmtime(path))
             self.pipeline = self.model_data['pipeline']
+            self.class_labels = self.model_data.get('class_labels')
+            if self.class_labels is None and hasattr(self.pipeline.named_steps['model'], 'classes_'):
+                # Models saved before labels were stored with the pipeline
+                self.class_labels = [str(c) for c in self.pipeline.named_steps['model'].classes_]
         except Exception as e:
             logger.error(f'Failed to load model {self.model.id}: {str(e)}')
             raise PredictionError(
@@ -56,12 +131,77 @@ class PredictionService:
                 meta={'error': str(e)}
             )
 
-    def validate_input(self, data: list[dict]) -> pd.DataFrame:
+        # Regression models are served from the float64 pipeline; ONNX files
+        # exported for them before that rule are ignored
+        if (
+            self.model.onnx_file
+            and onnxruntime is not None
+            and self.model.task_type == TrainingJob.TaskType.CLASSIFICATION
+        ):
+            try:
+                path = self.model.onnx_file.path
+                self.onnx_session = _load_onnx_session(path, os.path.getmtime(path))
+            except Exception as e:
+                # The joblib pipeline remains a complete fallback
+                logger.warning(f'Failed to load ONNX model {self.model.id}: {str(e)}')
+
+    def _run_model(self, df: pd.DataFrame, with_probabilities: bool = False) -> tuple:
+        """
+        Predict in chunks of PREDICT_CHUNK_SIZE rows.
+
+        Returns:
+            Tuple of (predictions, probabilities or None)
+        """
+        chunk_size = self.PREDICT_CHUNK_SIZE
+        if len(df) <= chunk_size:
+            return self._run_model_chunk(df, with_probabilities)
+
+        results = [
+            self._run_model_chunk(df.iloc[start:start + chunk_size], with_probabilities)
+            for start in range(0, len(df), chunk_size)
+        ]
+        predictions = np.concatenate([p for p, _ in results])
+        if results[0][1] is None:
+            return predictions, None
+        return predictions, np.concatenate([proba for _, proba in results])
+
+    def _run_model_chunk(self, df: pd.DataFrame, with_probabilities: bool = False) -> tuple:
+        """
+        Predict with the ONNX session when loaded, otherwise the pipeline.
+
+        The ONNX graph holds only the final estimator, so preprocessing
+        always runs through the fitted pipeline steps.
+
+        Returns:
+            Tuple of (predictions, probabilities or None)
+        """
+        model = self.pipeline.named_steps.get('model')
+        wants_proba = with_probabilities and hasattr(model, 'predict_proba')
+
+        # Preprocess once; predictions and probabilities share the result
+        X = self.pipeline[:-1].transform(df)
+
+        if self.onnx_session is not None:
+            try:
+                outputs = self.onnx_session.run(
+                    None, {self.onnx_session.get_inputs()[0].name: to_float32(to_dense(X))}
+                )
+                probabilities = outputs[1] if wants_proba and len(outputs) > 1 else None
+                return outputs[0].ravel(), probabilities
+            except Exception as e:
+                logger.warning(f'ONNX prediction failed, using pipeline: {str(e)}')
+
+        estimator = self.pipeline[-1]
+        predictions = estimator.predict(X)
+        probabilities = estimator.predict_proba(X) if wants_proba else None
+        return predictions, probabilities
+
+    def validate_input(self, data: list[dict] | pd.DataFrame) -> pd.DataFrame:
         """
         Validate input data against model's input schema.
 
         Args:
-            data: List of dictionaries with input features
+            data: List of dictionaries or a DataFrame with input features
 
         Returns:
             Validated DataFrame
@@ -69,7 +209,8 @@ class PredictionService:
         Raises:
             ValidationError: If input doesn't match schema
         """
-        if not data:
+        is_frame = isinstance(data, pd.DataFrame)
+        if data.empty if is_frame else not data:
             raise ValidationError(
                 detail='Input data cannot be empty.',
                 code='EMPTY_INPUT'
@@ -77,20 +218,18 @@ class PredictionService:
 
         # Convert to DataFrame
         try:
-            df = pd.DataFrame(data)
+            df = data if is_frame else pd.DataFrame(data)
         except Exception as e:
             raise ValidationError(
                 detail='Invalid input data format.',
                 meta={'error': str(e)}
             )
 
-        # Get expected columns
-        feature_columns = self.model.feature_columns
-        input_schema = self.model.input_schema
-
         # Check for missing required columns
-        missing_cols = set(feature_columns) - set(df.columns)
-        if missing_cols:
+        missing = self.feature_set.difference(df.columns)
+        if missing:
+            # One list, in feature order, so the message is stable
+            missing_cols = [col for col in self.feature_columns if col in missing]
             raise ValidationError(
                 detail=f'Missing required columns: {", ".join(missing_cols)}',
                 code='MISSING_COLUMNS',
@@ -98,31 +237,46 @@ class PredictionService:
             )
 
         # Select only the required columns in the correct order
-        df = df[feature_columns]
-
-        # Validate data types (basic check)
-        for col in feature_columns:
-            if col in input_schema:
-                expected_dtype = input_schema[col].get('dtype')
-                if expected_dtype == 'numeric':
-                    # Try to convert to numeric
-                    try:
-                        df[col] = pd.to_numeric(df[col], errors='coerce')
-                    except Exception:
-                        pass
+        df = df[self.feature_columns]
+
+        # Coerce numeric columns in one call; columns that already parsed as
+        # numbers, as they do from CSV files and JSON numbers, are left as is
+        to_coerce = [
+            col for col in self.numeric_columns
+            if not pd.api.types.is_numeric_dtype(df[col])
+        ]
+        if to_coerce:
+            df[to_coerce] = df[to_coerce].apply(pd.to_numeric, errors='coerce')
 
         return df
 
-    def predict(self, data: list[dict]) -> list[Any]:
+    def _result_cache_key(self, method: str, data: list[dict] | pd.DataFrame) -> str | None:
+        """Return the result cache key for a small JSON request, else None."""
+        if isinstance(data, pd.DataFrame) or not data or len(data) > self.RESULT_CACHE_MAX_ROWS:
+            return None
+        try:
+            payload = json.dumps(data, sort_keys=True, separators=(',', ':'))
+        except (TypeError, ValueError):
+            return None
+        digest = hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+        return f'predictions:{method}:{self.model.id}:{digest}'
+
+    def predict(self, data: list[dict] | pd.DataFrame) -> list[Any]:
         """
         Run predictions on input data.
 
         Args:
-            data: List of dictionaries with input features
+            data: List of dictionaries or a DataFrame with input features
 
         Returns:
             List of predictions
         """
+        cache_key = self._result_cache_key('predict', data)
+        if cache_key is not None:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+
         if self.pipeline is None:
             self.load_model()
 
@@ -131,8 +285,8 @@ class PredictionService:
 
         # Run predictions
         try:
-            predictions = self.pipeline.predict(df)
-            return predictions.tolist()
+            predictions, _ = self._run_model(df)
+            result = predictions.tolist()
         except Exception as e:
             logger.error(f'Prediction failed: {str(e)}')
             raise PredictionError(
@@ -140,16 +294,26 @@ class PredictionService:
                 meta={'error': str(e)}
             )
 
-    def predict_with_probabilities(self, data: list[dict]) -> dict:
+        if cache_key is not None:
+            cache.set(cache_key, result, self.RESULT_CACHE_TIMEOUT)
+        return result
+
+    def predict_with_probabilities(self, data: list[dict] | pd.DataFrame) -> dict:
         """
         Run predictions with class probabilities (for classification).
 
         Args:
-            data: List of dictionaries with input features
+            data: List of dictionaries or a DataFrame with input features
 
         Returns:
             Dictionary with predictions and probabilities
         """
+        cache_key = self._result_cache_key('predict_with_probabilities', data)
+        if cache_key is not None:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+
         if self.pipeline is None:
             self.load_model()
 
@@ -158,25 +322,20 @@ class PredictionService:
 
         # Run predictions
         try:
-            predictions = self.pipeline.predict(df)
+            predictions, probabilities = self._run_model(df, with_probabilities=True)
             result = {
                 'predictions': predictions.tolist(),
                 'probabilities': None
             }
 
             # Get probabilities if available
-            model = self.pipeline.named_steps.get('model')
-            if hasattr(model, 'predict_proba'):
-                probabilities = self.pipeline.predict_proba(df)
-                # Get class labels
-                classes = model.classes_.tolist()
+            if probabilities is not None:
+                # tolist() converts every probability in C
                 result['probabilities'] = [
-                    {str(cls): float(prob) for cls, prob in zip(classes, row)}
-                    for row in probabilities
+                    dict(zip(self.class_labels, row))
+                    for row in probabilities.astype(np.float64, copy=False).tolist()
                 ]
 
-            return result
-
         except Exception as e:
             logger.error(f'Prediction failed: {str(e)}')
             raise PredictionError(
@@ -184,6 +343,10 @@ class PredictionService:
                 meta={'error': str(e)}
             )
 
+        if cache_key is not None:
+            cache.set(cache_key, result, self.RESULT_CACHE_TIMEOUT)
+        return result
+
     def run_prediction_job(self, job: PredictionJob) -> PredictionJob:
         """
         Execute a prediction job.
@@ -196,7 +359,7 @@ class PredictionService:
         """
         try:
             job.status = PredictionJob.Status.RUNNING
-            job.save()
+            job.save(update_fields=['status'])
 
             # Load model
             self.load_model()
@@ -205,11 +368,11 @@ class PredictionService:
             if job.input_type == PredictionJob.InputType.JSON:
                 input_data = job.input_data
             else:
-                # Load from file
+                # Load from file, kept as a DataFrame end to end
                 input_data = self._load_input_file(job)
 
             job.input_row_count = len(input_data)
-            job.save()
+            job.save(update_fields=['input_row_count'])
 
             # Run predictions
             predictions = self.predict(input_data)
@@ -219,10 +382,11 @@ class PredictionService:
             if job.input_type == PredictionJob.InputType.FILE:
                 output_file = self._save_output_file(input_data, predictions, job)
                 job.output_file = output_file
+                job.predictions = predictions[:self.PREDICTIONS_PREVIEW_ROWS]
 
             job.status = PredictionJob.Status.COMPLETED
             job.completed_at = timezone.now()
-            job.save()
+            job.save(update_fields=['predictions', 'output_file', 'status', 'completed_at'])
 
             logger.info(
                 f'Prediction job {job.id} completed. '
@@ -234,12 +398,16 @@ class PredictionService:
         except Exception as e:
             logger.error(f'Prediction job {job.id} failed: {str(e)}')
             job.status = PredictionJob.Status.ERROR
-            job.error_message = str(e)
+            job.error_message = str(e)[:self.ERROR_MESSAGE_MAX_LENGTH]
             job.completed_at = timezone.now()
-            job.save()
+            PredictionJob.objects.filter(id=job.id).update(
+                status=job.status,
+                error_message=job.error_message,
+                completed_at=job.completed_at,
+            )
             raise
 
-    def _load_input_file(self, job: PredictionJob) -> list[dict]:
+    def _load_input_file(self, job: PredictionJob) -> pd.DataFrame:
         """Load input data from uploaded file."""
         if not job.input_file:
             raise PredictionError(detail='Input file not found.')
@@ -251,14 +419,14 @@ class PredictionService:
             if file_name.endswith('.csv'):
                 df = pd.read_csv(file_path)
             elif file_name.endswith(('.xlsx', '.xls')):
-                df = pd.read_excel(file_path)
+                df = self._read_excel(file_path)
             else:
                 raise PredictionError(
                     detail='Unsupported file type. Use CSV or Excel.',
                     code='UNSUPPORTED_FILE_TYPE'
                 )
 
-            return df.to_dict(orient='records')
+            return df
 
         except Exception as e:
             raise PredictionError(
@@ -266,30 +434,36 @@ class PredictionService:
                 meta={'error': str(e)}
             )
 
+    def _read_excel(self, file_path: str) -> pd.DataFrame:
+        """Read an Excel file, preferring the Rust-backed calamine engine."""
+        try:
+            return pd.read_excel(file_path, engine='calamine')
+        except (ImportError, ValueError) as e:
+            logger.info(f'Calamine reader unavailable, using default: {e}')
+            return pd.read_excel(file_path)
+
     def _save_output_file(
         self,
-        input_data: list[dict],
+        input_data: pd.DataFrame,
         predictions: list,
         job: PredictionJob
     ) -> str:
-        """Save predictions to a CSV file."""
-        try:
-            # Create DataFrame with input and predictions
-            df = pd.DataFrame(input_data)
-            df['prediction'] = predictions
-
-            # Write to temp file
-            temp_file = tempfile.NamedTemporaryFile(
-                delete=False,
-                suffix='.csv',
-                prefix=f'predictions_{job.id}_'
-            )
-            df.to_csv(temp_file.name, index=False)
-            temp_file.close()
+        """
+        Save predictions to a CSV file.
 
-            # Save to model
-            with open(temp_file.name, 'rb') as f:
-                job.output_file.save(f'predictions_{job.id}.csv', File(f))
+        The prediction column is added to input_data in place. The CSV is
+        written once, to a temporary upload file that filesystem storage
+        moves into place instead of copying.
+        """
+        try:
+            input_data['prediction'] = predictions
+
+            file_name = f'predictions_{job.id}.csv'
+            with TemporaryUploadedFile(file_name, 'text/csv', None, 'utf-8') as temp_file:
+                input_data.to_csv(temp_file, index=False)
+                temp_file.flush()
+                # Saved with the job's other completion fields
+                job.output_file.save(file_name, temp_file, save=False)
 
             return job.output_file.name
 
@@ -0,0 +1,16 @@
+"""
+Signal handlers for the Predictions app.
+"""
+
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from apps.ml.models import TrainedModel
+
+from .services.prediction_service import clear_model_cache
+
+
+@receiver(post_delete, sender=TrainedModel)
+def evict_deleted_model(sender, instance, **kwargs):
+    """Release loaded models once one is deleted, rather than wait for eviction."""
+    clear_model_cache()
@@ -5,15 +5,19 @@ Celery tasks for the Predictions app.
 import logging
 
 from celery import shared_task
+from django.utils import timezone
 
 logger = logging.getLogger(__name__)
 
 
-@shared_task(bind=True, max_retries=0)
+@shared_task(bind=True, max_retries=0, ignore_result=True)
 def run_batch_prediction_task(self, job_id: str) -> dict:
     """
     Async task to run batch predictions.
 
+    Only the job id travels through the broker; input rows are read from
+    the database. Nothing polls the task result, so it isn't stored.
+
     Args:
         job_id: UUID of the PredictionJob to process
 
@@ -26,7 +30,12 @@ def run_batch_prediction_task(self, job_id: str) -> dict:
     try:
         logger.info(f'Starting async batch prediction for job {job_id}')
 
-        job = PredictionJob.objects.get(id=job_id)
+        # The model's SHAP values and other explainability data are not
+        # needed to predict
+        job = PredictionJob.objects.select_related('model').defer(
+            'predictions',
+            *(f'model__{field}' for field in PredictionService.UNUSED_MODEL_FIELDS),
+        ).get(id=job_id)
 
         # Update status to running
         job.status = PredictionJob.Status.RUNNING
@@ -52,14 +61,12 @@ def run_batch_prediction_task(self, job_id: str) -> dict:
     except Exception as e:
         logger.error(f'Async batch prediction failed for job {job_id}: {str(e)}')
 
-        # Update job status to error
-        try:
-            job = PredictionJob.objects.get(id=job_id)
-            job.status = PredictionJob.Status.ERROR
-            job.error_message = str(e)
-            job.save(update_fields=['status', 'error_message'])
-        except PredictionJob.DoesNotExist:
-            pass
+        # Update job status to error in a single query
+        PredictionJob.objects.filter(id=job_id).update(
+            status=PredictionJob.Status.ERROR,
+            error_message=str(e)[:PredictionService.ERROR_MESSAGE_MAX_LENGTH],
+            completed_at=timezone.now(),
+        )
 
         # Don't retry - just log and return
         return {
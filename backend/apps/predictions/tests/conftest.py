@@ -0,0 +1,45 @@
+"""
+Fixtures for Predictions tests.
+"""
+
+import io
+
+import joblib
+import numpy as np
+import pytest
+from django.core.files.base import ContentFile
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from apps.ml.models import TrainedModel
+from apps.predictions.services.prediction_service import clear_model_cache
+
+
+@pytest.fixture
+def trained_model(training_job):
+    """Create a trained model backed by a small fitted pipeline on disk."""
+    X = np.array([[0.0, 1.0], [1.0, 0.0], [0.5, 2.0], [2.0, 0.5]])
+    pipeline = Pipeline([
+        ('preprocessor', StandardScaler()),
+        ('model', LogisticRegression()),
+    ]).fit(X, [0, 1, 0, 1])
+
+    buffer = io.BytesIO()
+    joblib.dump({'pipeline': pipeline}, buffer)
+
+    model = TrainedModel(
+        training_job=training_job,
+        dataset=training_job.dataset,
+        owner=training_job.owner,
+        name='logistic_regression',
+        display_name='Logistic Regression',
+        algorithm_type=TrainedModel.AlgorithmType.LOGISTIC_REGRESSION,
+        task_type=training_job.task_type,
+        target_column='target',
+        feature_columns=['col1', 'col2'],
+    )
+    model.model_file.save('model.joblib', ContentFile(buffer.getvalue()))
+    clear_model_cache()
+    yield model
+    clear_model_cache()
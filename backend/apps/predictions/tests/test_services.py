@@ -0,0 +1,227 @@
+"""
+Tests for Predictions services.
+"""
+
+import io
+import os
+
+from unittest.mock import patch
+
+import joblib
+import pandas as pd
+import pytest
+from django.core.files.base import ContentFile
+
+from apps.core.exceptions import ValidationError
+from apps.ml.models import TrainingJob
+from apps.predictions.models import PredictionJob
+from apps.predictions.services import PredictionService
+from apps.predictions.services.prediction_service import _load_model_data
+
+
+@pytest.mark.django_db
+class TestPredictionServiceModelCache:
+    """Tests for the process-wide model cache."""
+
+    def test_services_share_loaded_pipeline(self, trained_model):
+        """Test a second service for the same model reuses the loaded pipeline."""
+        first = PredictionService(trained_model)
+        first.load_model()
+        second = PredictionService(trained_model)
+        second.load_model()
+
+        assert second.pipeline is first.pipeline
+        assert _load_model_data.cache_info().misses == 1
+        assert second.predict([{'col1': 0.0, 'col2': 1.0}]) == [0]
+
+    def test_replaced_file_is_reloaded(self, trained_model):
+        """Test a model file with a new modification time is loaded again."""
+        first = PredictionService(trained_model)
+        first.load_model()
+
+        path = trained_model.model_file.path
+        mtime = os.path.getmtime(path)
+        os.utime(path, (mtime + 1, mtime + 1))
+
+        second = PredictionService(trained_model)
+        second.load_model()
+
+        assert second.pipeline is not first.pipeline
+
+    def test_regression_model_ignores_onnx_file(self, trained_model):
+        """Test regression models are served by the pipeline even with an ONNX file."""
+        trained_model.task_type = TrainingJob.TaskType.REGRESSION
+        trained_model.onnx_file.save('model.onnx', ContentFile(b'onnx'))
+
+        with patch(
+            'apps.predictions.services.prediction_service._load_onnx_session'
+        ) as load_onnx_session:
+            service = PredictionService(trained_model)
+            service.load_model()
+
+        load_onnx_session.assert_not_called()
+        assert service.onnx_session is None
+
+    def test_deleting_a_model_clears_the_cache(self, trained_model):
+        """Test deleting a trained model drops loaded models."""
+        PredictionService(trained_model).load_model()
+        assert _load_model_data.cache_info().currsize == 1
+
+        trained_model.delete()
+
+        assert _load_model_data.cache_info().currsize == 0
+
+
+@pytest.mark.django_db
+class TestPredictionServiceResultCache:
+    """Tests for the short-lived prediction result cache."""
+
+    def test_repeated_request_is_served_from_cache(self, trained_model):
+        """Test an identical payload does not run the model again."""
+        data = [{'col1': 0.0, 'col2': 1.0}]
+        expected = PredictionService(trained_model).predict_with_probabilities(data)
+
+        with patch.object(PredictionService, '_run_model') as run_model:
+            assert PredictionService(trained_model).predict_with_probabilities(data) == expected
+            run_model.assert_not_called()
+
+    def test_different_payload_runs_model(self, trained_model):
+        """Test a new payload is not answered from another request's result."""
+        PredictionService(trained_model).predict([{'col1': 0.0, 'col2': 1.0}])
+
+        service = PredictionService(trained_model)
+        with patch.object(PredictionService, '_run_model', wraps=service._run_model) as run_model:
+            service.predict([{'col1': 3.0, 'col2': 4.0}])
+            run_model.assert_called_once()
+
+
+@pytest.mark.django_db
+class TestPredictionServiceBatch:
+    """Tests for file-based prediction jobs."""
+
+    def test_file_job_keeps_input_columns(self, trained_model):
+        """Test a CSV job writes every input column followed by the predictions."""
+        job = PredictionJob(
+            model=trained_model,
+            owner=trained_model.owner,
+            input_type=PredictionJob.InputType.FILE,
+        )
+        job.input_file.save(
+            'input.csv', ContentFile(b'id,col1,col2\na,0.0,1.0\nb,1.0,0.0'), save=False
+        )
+        job.save()
+
+        PredictionService(trained_model).run_prediction_job(job)
+
+        job.refresh_from_db()
+        assert job.status == PredictionJob.Status.COMPLETED
+        assert job.input_row_count == 2
+        assert job.predictions == [0, 1]
+        output = pd.read_csv(job.output_file.path)
+        assert output.columns.tolist() == ['id', 'col1', 'col2', 'prediction']
+        assert output['prediction'].tolist() == [0, 1]
+
+    def test_excel_file_job(self, trained_model):
+        """Test an Excel input file is read and predicted like a CSV."""
+        buffer = io.BytesIO()
+        pd.DataFrame({'col1': [0.0, 1.0], 'col2': [1.0, 0.0]}).to_excel(buffer, index=False)
+        job = PredictionJob(
+            model=trained_model,
+            owner=trained_model.owner,
+            input_type=PredictionJob.InputType.FILE,
+        )
+        job.input_file.save('input.xlsx', ContentFile(buffer.getvalue()), save=False)
+        job.save()
+
+        PredictionService(trained_model).run_prediction_job(job)
+
+        job.refresh_from_db()
+        assert job.predictions == [0, 1]
+
+    def test_file_job_stores_prediction_preview(self, trained_model):
+        """Test a file job keeps only a preview of its predictions on the row."""
+        job = PredictionJob(
+            model=trained_model,
+            owner=trained_model.owner,
+            input_type=PredictionJob.InputType.FILE,
+        )
+        job.input_file.save(
+            'input.csv', ContentFile(b'col1,col2\n0.0,1.0\n1.0,0.0'), save=False
+        )
+        job.save()
+        service = PredictionService(trained_model)
+        service.PREDICTIONS_PREVIEW_ROWS = 1
+
+        service.run_prediction_job(job)
+
+        job.refresh_from_db()
+        assert job.input_row_count == 2
+        assert job.predictions == [0]
+        assert pd.read_csv(job.output_file.path)['prediction'].tolist() == [0, 1]
+
+    def test_empty_dataframe_is_rejected(self, trained_model):
+        """Test an empty DataFrame fails validation like an empty list."""
+        with pytest.raises(ValidationError):
+            PredictionService(trained_model).validate_input(pd.DataFrame())
+
+    def test_chunked_predictions_match_single_pass(self, trained_model):
+        """Test predicting in small chunks gives the same output as one pass."""
+        rows = [{'col1': i / 10, 'col2': 1 - i / 10} for i in range(7)]
+        service = PredictionService(trained_model)
+        expected = service.predict_with_probabilities(rows)
+
+        service.PREDICT_CHUNK_SIZE = 3
+
+        assert service.predict_with_probabilities(rows) == expected
+
+    def test_probabilities_keyed_by_class_label(self, trained_model):
+        """Test each row's probabilities are plain floats keyed by label string."""
+        result = PredictionService(trained_model).predict_with_probabilities(
+            [{'col1': 0.0, 'col2': 1.0}]
+        )
+
+        (row,) = result['probabilities']
+        assert list(row) == ['0', '1']
+        assert all(type(p) is float for p in row.values())
+        assert sum(row.values()) == pytest.approx(1.0)
+
+    def test_probabilities_preprocess_once(self, trained_model):
+        """Test predictions and probabilities share one preprocessing pass."""
+        service = PredictionService(trained_model)
+        service.load_model()
+        scaler = service.pipeline.named_steps['preprocessor']
+
+        with patch.object(scaler, 'transform', wraps=scaler.transform) as transform:
+            service.predict_with_probabilities(pd.DataFrame({'col1': [0.25], 'col2': [0.75]}))
+
+        transform.assert_called_once()
+
+    def test_probabilities_use_stored_class_labels(self, trained_model):
+        """Test labels saved with the model are used as probability keys."""
+        model_data = _load_model_data(trained_model.model_file.path, 0.0)
+        buffer = io.BytesIO()
+        joblib.dump({**model_data, 'class_labels': ['no', 'yes']}, buffer)
+        trained_model.model_file.save('labelled.joblib', ContentFile(buffer.getvalue()))
+
+        result = PredictionService(trained_model).predict_with_probabilities(
+            [{'col1': 0.0, 'col2': 1.0}]
+        )
+
+        assert list(result['probabilities'][0]) == ['no', 'yes']
+
+    def test_validate_input_uses_schema(self, trained_model):
+        """Test missing columns are rejected and numeric columns are coerced."""
+        trained_model.input_schema = {'col1': {'dtype': 'numeric'}, 'col2': {'dtype': 'categorical'}}
+        service = PredictionService(trained_model)
+
+        with pytest.raises(ValidationError) as excinfo:
+            service.validate_input([{'other': 1}])
+        assert excinfo.value.meta['missing'] == ['col1', 'col2']
+
+        df = service.validate_input([{'extra': 'x', 'col2': 'b', 'col1': '0.5'}])
+        assert df.columns.tolist() == ['col1', 'col2']
+        assert df['col1'].tolist() == [0.5]
+        assert df['col2'].tolist() == ['b']
+
+        df = service.validate_input([{'col1': 'abc', 'col2': 'b'}])
+        assert df['col1'].isna().all()
@@ -0,0 +1,56 @@
+"""
+Tests for Predictions Celery tasks.
+"""
+
+from unittest.mock import patch
+
+import pytest
+
+from apps.predictions.models import PredictionJob
+from apps.predictions.services import PredictionService
+from apps.predictions.tasks import run_batch_prediction_task
+
+
+@pytest.mark.django_db
+class TestRunBatchPredictionTask:
+    """Tests for run_batch_prediction_task."""
+
+    def test_json_job_completes(self, trained_model):
+        """Test the task predicts a JSON job read from the database by id."""
+        job = PredictionJob.objects.create(
+            model=trained_model,
+            owner=trained_model.owner,
+            input_type=PredictionJob.InputType.JSON,
+            input_data=[{'col1': 0.0, 'col2': 1.0}, {'col1': 1.0, 'col2': 0.0}],
+        )
+
+        result = run_batch_prediction_task(str(job.id))
+
+        assert result['status'] == PredictionJob.Status.COMPLETED
+        assert result['row_count'] == 2
+        job.refresh_from_db()
+        assert job.status == PredictionJob.Status.COMPLETED
+        assert job.predictions == [0, 1]
+
+    def test_missing_job_raises(self):
+        """Test an unknown job id is reported rather than swallowed."""
+        with pytest.raises(PredictionJob.DoesNotExist):
+            run_batch_prediction_task('00000000-0000-0000-0000-000000000000')
+
+    def test_failed_job_is_marked_error(self, trained_model):
+        """Test a failure is recorded on the job with a bounded message."""
+        job = PredictionJob.objects.create(
+            model=trained_model,
+            owner=trained_model.owner,
+            input_type=PredictionJob.InputType.JSON,
+            input_data=[{'col1': 0.0, 'col2': 1.0}],
+        )
+
+        with patch.object(PredictionService, 'predict', side_effect=RuntimeError('x' * 20_000)):
+            result = run_batch_prediction_task(str(job.id))
+
+        assert result['status'] == 'error'
+        job.refresh_from_db()
+        assert job.status == PredictionJob.Status.ERROR
+        assert len(job.error_message) == PredictionService.ERROR_MESSAGE_MAX_LENGTH
+        assert job.completed_at is not None
@@ -0,0 +1,169 @@
+"""
+Tests for Predictions views.
+"""
+
+from unittest.mock import patch
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.predictions.models import PredictionJob
+from apps.core.exceptions import PredictionError
+from apps.predictions.views import (
+    PREDICTION_JOB_DETAIL_FIELDS,
+    BatchPredictView,
+    ModelPredictionsView,
+    PredictionJobViewSet,
+    PredictView,
+)
+
+
+@pytest.mark.django_db
+class TestModelPredictionsView:
+    """Tests for listing a model's prediction jobs."""
+
+    def test_queries_do_not_grow_with_jobs(self, trained_model):
+        """Test the model and its jobs are read in two queries."""
+        PredictionJob.objects.bulk_create(
+            PredictionJob(model=trained_model, owner=trained_model.owner)
+            for _ in range(5)
+        )
+        request = APIRequestFactory().get('/')
+        force_authenticate(request, user=trained_model.owner)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = ModelPredictionsView.as_view()(request, model_id=trained_model.id)
+            response.render()
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(queries) == 2
+        assert response.data['count'] == 5
+        assert {job['model_name'] for job in response.data['jobs']} == {'Logistic Regression'}
+
+
+@pytest.mark.django_db
+class TestPredictionJobViewSet:
+    """Tests for the prediction job list and detail endpoints."""
+
+    def test_list_skips_detail_columns(self, trained_model):
+        """Test the list query doesn't read inputs, predictions or model internals."""
+        PredictionJob.objects.create(
+            model=trained_model,
+            owner=trained_model.owner,
+            input_data=[{'col1': 0.0, 'col2': 1.0}],
+            predictions=[0],
+        )
+        request = APIRequestFactory().get('/')
+        force_authenticate(request, user=trained_model.owner)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = PredictionJobViewSet.as_view({'get': 'list'})(request)
+            response.render()
+
+        assert response.status_code == status.HTTP_200_OK
+        (select,) = [q['sql'] for q in queries if '"predictions_predictionjob"."status"' in q['sql']]
+        for field in (*PREDICTION_JOB_DETAIL_FIELDS, 'shap_values'):
+            assert f'"{field}"' not in select
+
+    def test_detail_includes_predictions(self, trained_model):
+        """Test the detail endpoint still returns the full job."""
+        job = PredictionJob.objects.create(
+            model=trained_model,
+            owner=trained_model.owner,
+            input_data=[{'col1': 0.0, 'col2': 1.0}],
+            predictions=[0],
+        )
+        request = APIRequestFactory().get('/')
+        force_authenticate(request, user=trained_model.owner)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = PredictionJobViewSet.as_view({'get': 'retrieve'})(request, pk=job.id)
+            response.render()
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['predictions'] == [0]
+        # Job, model and dataset in one query
+        assert len(queries) == 1
+        assert response.data['model']['dataset_name'] == trained_model.dataset.name
+
+
+def post_predict(user, payload):
+    """Call PredictView with an authenticated JSON POST; return (response, query count)."""
+    request = APIRequestFactory().post('/', payload, format='json')
+    force_authenticate(request, user=user)
+    with CaptureQueriesContext(connection) as queries:
+        response = PredictView.as_view()(request)
+        response.render()
+    return response, len(queries)
+
+
+@pytest.mark.django_db
+class TestPredictView:
+    """Tests for JSON predictions."""
+
+    def test_job_is_written_once(self, trained_model):
+        """Test a successful prediction inserts its finished job in one write."""
+        response, query_count = post_predict(trained_model.owner, {
+            'model_id': str(trained_model.id),
+            'data': [{'col1': 0.0, 'col2': 1.0}],
+        })
+
+        assert response.status_code == status.HTTP_201_CREATED
+        # Model lookup and the job INSERT
+        assert query_count == 2
+        job = PredictionJob.objects.get(id=response.data['job_id'])
+        assert job.status == PredictionJob.Status.COMPLETED
+        assert job.predictions == [0]
+        assert job.completed_at is not None
+
+    def test_failed_prediction_is_recorded(self, trained_model):
+        """Test a failed prediction still leaves an error job behind."""
+        with patch(
+            'apps.predictions.views.PredictionService.predict',
+            side_effect=PredictionError(detail='Prediction failed.'),
+        ):
+            response, _ = post_predict(trained_model.owner, {
+                'model_id': str(trained_model.id),
+                'data': [{'col1': 0.0, 'col2': 1.0}],
+            })
+
+        assert response.status_code >= 400
+        job = PredictionJob.objects.get(model=trained_model)
+        assert job.status == PredictionJob.Status.ERROR
+
+
+@pytest.mark.django_db
+class TestBatchPredictView:
+    """Tests for file predictions."""
+
+    def post_batch(self, trained_model, query=''):
+        request = APIRequestFactory().post(f'/{query}', {
+            'model_id': str(trained_model.id),
+            'file': SimpleUploadedFile('input.csv', b'col1,col2\n0,1\n1,0\n', content_type='text/csv'),
+        }, format='multipart')
+        force_authenticate(request, user=trained_model.owner)
+        return BatchPredictView.as_view()(request)
+
+    def test_job_is_queued_by_default(self, trained_model):
+        """Test the job is handed to Celery and 202 is returned at once."""
+        with patch('apps.predictions.tasks.run_batch_prediction_task.delay') as delay:
+            response = self.post_batch(trained_model)
+
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        delay.assert_called_once_with(response.data['job_id'])
+        assert response.data['job_id'] in response.data['message']
+        assert PredictionJob.objects.get(id=response.data['job_id']).status == PredictionJob.Status.PENDING
+
+    def test_sync_predicts_in_request(self, trained_model):
+        """Test sync=true still runs the job within the request."""
+        with patch('apps.predictions.tasks.run_batch_prediction_task.delay') as delay:
+            response = self.post_batch(trained_model, '?sync=true')
+
+        assert response.status_code == status.HTTP_201_CREATED
+        delay.assert_not_called()
+        assert response.data['status'] == PredictionJob.Status.COMPLETED
+        assert response.data['predictions'] == [0, 1]
@@ -4,7 +4,7 @@ Views for the Predictions app.
 
 import logging
 
-from django.http import FileResponse
+from django.utils import timezone
 from rest_framework import permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -12,7 +12,9 @@ from rest_framework.views import APIView
 from rest_framework.viewsets import ReadOnlyModelViewSet
 
 from apps.core.exceptions import ModelNotFoundError, PredictionError
+from apps.core.files import download_response
 from apps.ml.models import TrainedModel
+from apps.ml.views import TRAINED_MODEL_DETAIL_FIELDS
 
 from .models import PredictionJob
 from .serializers import (
@@ -26,6 +28,9 @@ from .services import PredictionService
 
 logger = logging.getLogger(__name__)
 
+# Potentially large columns that only the detail serializer reads
+PREDICTION_JOB_DETAIL_FIELDS = ('input_data', 'predictions', 'error_message')
+
 
 class PredictionJobViewSet(ReadOnlyModelViewSet):
     """
@@ -41,9 +46,15 @@ class PredictionJobViewSet(ReadOnlyModelViewSet):
 
     def get_queryset(self):
         """Return prediction jobs owned by the current user."""
-        return PredictionJob.objects.filter(
-            owner=self.request.user
-        ).select_related('model')
+        queryset = PredictionJob.objects.filter(owner=self.request.user)
+        if self.action == 'list':
+            # The list shows only the model's name
+            return queryset.select_related('model').defer(
+                *PREDICTION_JOB_DETAIL_FIELDS,
+                *(f'model__{field}' for field in TRAINED_MODEL_DETAIL_FIELDS),
+            )
+        # The detail serializer nests the model with its dataset's name
+        return queryset.select_related('model__dataset')
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -76,12 +87,7 @@ class PredictionJobViewSet(ReadOnlyModelViewSet):
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-            response = FileResponse(
-                job.output_file.open('rb'),
-                as_attachment=True,
-                filename=f'predictions_{job.id}.csv'
-            )
-            return response
+            return download_response(job.output_file, f'predictions_{job.id}.csv')
 
         except Exception as e:
             logger.error(f'Failed to download predictions: {str(e)}')
@@ -114,15 +120,17 @@ class PredictView(APIView):
 
         # Get the model and verify ownership
         try:
-            trained_model = TrainedModel.objects.get(
+            trained_model = TrainedModel.objects.defer(
+                *PredictionService.UNUSED_MODEL_FIELDS
+            ).get(
                 id=model_id,
                 owner=request.user
             )
         except TrainedModel.DoesNotExist:
             raise ModelNotFoundError()
 
-        # Create prediction job
-        job = PredictionJob.objects.create(
+        # The job row is written once, with its outcome, after predicting
+        job = PredictionJob(
             model=trained_model,
             owner=request.user,
             input_type=PredictionJob.InputType.JSON,
@@ -142,9 +150,10 @@ class PredictView(APIView):
                 predictions = prediction_service.predict(input_data)
                 probabilities = None
 
-            # Update job
+            # Record the job
             job.predictions = predictions
             job.status = PredictionJob.Status.COMPLETED
+            job.completed_at = timezone.now()
             job.save()
 
             logger.info(
@@ -160,13 +169,15 @@ class PredictView(APIView):
                 'task_type': trained_model.task_type,
             }, status=status.HTTP_201_CREATED)
 
-        except PredictionError:
-            raise
         except Exception as e:
             job.status = PredictionJob.Status.ERROR
-            job.error_message = str(e)
+            job.error_message = str(e)[:PredictionService.ERROR_MESSAGE_MAX_LENGTH]
+            job.completed_at = timezone.now()
             job.save()
 
+            if isinstance(e, PredictionError):
+                raise
+
             logger.error(f'Prediction failed: {str(e)}')
             raise PredictionError(
                 detail='Prediction failed.',
@@ -180,8 +191,11 @@ class BatchPredictView(APIView):
 
     POST /api/v1/predictions/batch/
 
+    The job is queued for a Celery worker and 202 Accepted is returned at
+    once; poll GET /api/v1/predictions/jobs/{job_id}/ for its status.
+
     Query Parameters:
-        async: If 'true', run predictions as background task (returns 202 Accepted)
+        sync: If 'true', predict within the request instead (returns 201 Created)
     """
 
     permission_classes = [permissions.IsAuthenticated]
@@ -192,11 +206,14 @@ class BatchPredictView(APIView):
 
         model_id = serializer.validated_data['model_id']
         uploaded_file = serializer.validated_data['file']
-        run_async = request.query_params.get('async', 'false').lower() == 'true'
+        run_sync = request.query_params.get('sync', 'false').lower() == 'true'
 
         # Get the model and verify ownership
         try:
-            trained_model = TrainedModel.objects.get(
+            # The synchronous response nests the model with its dataset's name
+            trained_model = TrainedModel.objects.select_related('dataset').defer(
+                *PredictionService.UNUSED_MODEL_FIELDS
+            ).get(
                 id=model_id,
                 owner=request.user
             )
@@ -212,7 +229,7 @@ class BatchPredictView(APIView):
         job.input_file.save(uploaded_file.name, uploaded_file)
         job.save()
 
-        if run_async:
+        if not run_sync:
             # Dispatch async task
             from .tasks import run_batch_prediction_task
             run_batch_prediction_task.delay(str(job.id))
@@ -224,7 +241,7 @@ class BatchPredictView(APIView):
             return Response({
                 'job_id': str(job.id),
                 'status': job.status,
-                'message': 'Batch prediction job queued. Check status at /api/v1/predictions/jobs/{job_id}/',
+                'message': f'Batch prediction job queued. Check status at /api/v1/predictions/jobs/{job.id}/',
             }, status=status.HTTP_202_ACCEPTED)
 
         # Run predictions synchronously
@@ -274,9 +291,14 @@ class ModelPredictionsView(APIView):
         except TrainedModel.DoesNotExist:
             raise ModelNotFoundError()
 
-        jobs = PredictionJob.objects.filter(
+        jobs = list(PredictionJob.objects.filter(
             model=trained_model
-        ).order_by('-created_at')
+        ).defer(*PREDICTION_JOB_DETAIL_FIELDS).order_by('-created_at'))
+
+        # Every job belongs to the model already loaded; reuse it rather
+        # than fetching it again for each job's model name
+        for job in jobs:
+            job.model = trained_model
 
         serializer = PredictionJobListSerializer(jobs, many=True)
 
@@ -284,5 +306,5 @@ class ModelPredictionsView(APIView):
             'model_id': str(model_id),
             'model_name': trained_model.display_name,
             'jobs': serializer.data,
-            'count': jobs.count(),
+            'count': len(jobs),
         })
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-16 00:18
+
+import apps.core.ids
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (
+            "reports",
+            "0003_rename_reports_rep_share_t_idx_reports_rep_share_t_9bc35c_idx",
+        ),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="report",
+            name="id",
+            field=models.UUIDField(
+                default=apps.core.ids.uuid7,
+                editable=False,
+                primary_key=True,
+                serialize=False,
+            ),
+        ),
+    ]
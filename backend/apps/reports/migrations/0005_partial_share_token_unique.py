@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-16 00:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reports", "0004_time_ordered_ids"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="report",
+            name="reports_rep_share_t_9bc35c_idx",
+        ),
+        migrations.AlterField(
+            model_name="report",
+            name="share_token",
+            field=models.CharField(
+                blank=True,
+                help_text="Unique token for sharing report publicly",
+                max_length=64,
+                null=True,
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="report",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("share_token__isnull", False)),
+                fields=("share_token",),
+                name="reports_share_token_uniq",
+            ),
+        ),
+    ]
@@ -2,15 +2,19 @@
 Models for the Reports app.
 """
 
-import uuid
+import secrets
 
 from django.conf import settings
 from django.db import models
 
+from apps.core.ids import uuid7
 from apps.datasets.models import Dataset
 from apps.eda.models import EDAResult
 from apps.ml.models import TrainedModel
 
+# Random bytes in a share token; token_urlsafe encodes 32 as 43 characters
+SHARE_TOKEN_BYTES = 32
+
 
 class Report(models.Model):
     """Generated analysis report."""
@@ -26,7 +30,7 @@ class Report(models.Model):
         MODEL = 'model', 'Model Report'
         FULL = 'full', 'Full Analysis Report'
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     owner = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -75,7 +79,6 @@ class Report(models.Model):
         max_length=64,
         blank=True,
         null=True,
-        unique=True,
         help_text="Unique token for sharing report publicly"
     )
     is_public = models.BooleanField(
@@ -101,7 +104,15 @@ class Report(models.Model):
             models.Index(fields=['owner', '-created_at']),
             models.Index(fields=['dataset']),
             models.Index(fields=['status']),
-            models.Index(fields=['share_token']),
+        ]
+        constraints = [
+            # Most reports are never shared; index only the tokens that
+            # exist. The index also serves shared report lookups.
+            models.UniqueConstraint(
+                fields=['share_token'],
+                condition=models.Q(share_token__isnull=False),
+                name='reports_share_token_uniq',
+            ),
         ]
 
     def __str__(self):
@@ -115,8 +126,7 @@ class Report(models.Model):
         return None
 
     def generate_share_token(self):
-        """Generate a unique share token for this report."""
-        import secrets
+        """Generate a unique share token for this report; the caller saves it."""
         if not self.share_token:
-            self.share_token = secrets.token_urlsafe(32)
+            self.share_token = secrets.token_urlsafe(SHARE_TOKEN_BYTES)
         return self.share_token
@@ -3,9 +3,8 @@ Tests for Reports models.
 """
 
 import pytest
-from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, transaction
 
-from apps.datasets.models import Dataset
 from apps.eda.models import EDAResult
 from apps.ml.models import TrainedModel, TrainingJob
 from apps.reports.models import Report
@@ -15,20 +14,8 @@ from apps.reports.models import Report
 class TestReportModel:
     """Tests for the Report model."""
 
-    def test_create_report(self, user):
+    def test_create_report(self, user, dataset):
         """Test creating a report."""
-        csv_content = b'col1,col2,target\n1,2,0'
-        file = SimpleUploadedFile('test.csv', csv_content, content_type='text/csv')
-
-        dataset = Dataset.objects.create(
-            owner=user,
-            name='Test',
-            file=file,
-            original_filename='test.csv',
-            file_type='csv',
-            file_size=len(csv_content),
-        )
-
         report = Report.objects.create(
             owner=user,
             dataset=dataset,
@@ -41,20 +28,8 @@ class TestReportModel:
         assert report.owner == user
         assert report.status == Report.Status.PENDING
 
-    def test_report_status_choices(self, user):
+    def test_report_status_choices(self, user, dataset):
         """Test report status choices."""
-        csv_content = b'col1,col2,target\n1,2,0'
-        file = SimpleUploadedFile('test.csv', csv_content, content_type='text/csv')
-
-        dataset = Dataset.objects.create(
-            owner=user,
-            name='Test',
-            file=file,
-            original_filename='test.csv',
-            file_type='csv',
-            file_size=len(csv_content),
-        )
-
         report = Report.objects.create(
             owner=user,
             dataset=dataset,
@@ -67,20 +42,8 @@ class TestReportModel:
             report.refresh_from_db()
             assert report.status == status_value
 
-    def test_report_type_choices(self, user):
+    def test_report_type_choices(self, user, dataset):
         """Test report type choices."""
-        csv_content = b'col1,col2,target\n1,2,0'
-        file = SimpleUploadedFile('test.csv', csv_content, content_type='text/csv')
-
-        dataset = Dataset.objects.create(
-            owner=user,
-            name='Test',
-            file=file,
-            original_filename='test.csv',
-            file_type='csv',
-            file_size=len(csv_content),
-        )
-
         for report_type, _ in Report.ReportType.choices:
             report = Report.objects.create(
                 owner=user,
@@ -90,20 +53,8 @@ class TestReportModel:
             )
             assert report.report_type == report_type
 
-    def test_report_with_eda_result(self, user):
+    def test_report_with_eda_result(self, user, dataset):
         """Test report with EDA result."""
-        csv_content = b'col1,col2,target\n1,2,0'
-        file = SimpleUploadedFile('test.csv', csv_content, content_type='text/csv')
-
-        dataset = Dataset.objects.create(
-            owner=user,
-            name='Test',
-            file=file,
-            original_filename='test.csv',
-            file_type='csv',
-            file_size=len(csv_content),
-        )
-
         eda_result = EDAResult.objects.create(
             dataset=dataset,
             status=EDAResult.Status.COMPLETED,
@@ -119,20 +70,8 @@ class TestReportModel:
 
         assert report.eda_result == eda_result
 
-    def test_report_with_trained_model(self, user):
+    def test_report_with_trained_model(self, user, dataset):
         """Test report with trained model."""
-        csv_content = b'col1,col2,target\n1,2,0'
-        file = SimpleUploadedFile('test.csv', csv_content, content_type='text/csv')
-
-        dataset = Dataset.objects.create(
-            owner=user,
-            name='Test',
-            file=file,
-            original_filename='test.csv',
-            file_type='csv',
-            file_size=len(csv_content),
-        )
-
         training_job = TrainingJob.objects.create(
             dataset=dataset,
             owner=user,
@@ -160,20 +99,8 @@ class TestReportModel:
 
         assert report.trained_model == trained_model
 
-    def test_report_content_json(self, user):
+    def test_report_content_json(self, user, dataset):
         """Test report content JSON field."""
-        csv_content = b'col1,col2,target\n1,2,0'
-        file = SimpleUploadedFile('test.csv', csv_content, content_type='text/csv')
-
-        dataset = Dataset.objects.create(
-            owner=user,
-            name='Test',
-            file=file,
-            original_filename='test.csv',
-            file_type='csv',
-            file_size=len(csv_content),
-        )
-
         content = {
             'dataset': {
                 'name': 'Test',
@@ -196,20 +123,8 @@ class TestReportModel:
         assert report.content == content
         assert report.content['dataset']['name'] == 'Test'
 
-    def test_report_ai_summary(self, user):
+    def test_report_ai_summary(self, user, dataset):
         """Test report AI summary field."""
-        csv_content = b'col1,col2,target\n1,2,0'
-        file = SimpleUploadedFile('test.csv', csv_content, content_type='text/csv')
-
-        dataset = Dataset.objects.create(
-            owner=user,
-            name='Test',
-            file=file,
-            original_filename='test.csv',
-            file_type='csv',
-            file_size=len(csv_content),
-        )
-
         ai_summary = "This is an AI-generated summary of the report."
 
         report = Report.objects.create(
@@ -222,20 +137,8 @@ class TestReportModel:
         report.refresh_from_db()
         assert report.ai_summary == ai_summary
 
-    def test_report_cascade_delete_dataset(self, user):
+    def test_report_cascade_delete_dataset(self, user, dataset):
         """Test that deleting dataset deletes reports."""
-        csv_content = b'col1,col2,target\n1,2,0'
-        file = SimpleUploadedFile('test.csv', csv_content, content_type='text/csv')
-
-        dataset = Dataset.objects.create(
-            owner=user,
-            name='Test',
-            file=file,
-            original_filename='test.csv',
-            file_type='csv',
-            file_size=len(csv_content),
-        )
-
         report = Report.objects.create(
             owner=user,
             dataset=dataset,
@@ -247,20 +150,8 @@ class TestReportModel:
 
         assert not Report.objects.filter(id=report_id).exists()
 
-    def test_report_ordering(self, user):
+    def test_report_ordering(self, user, dataset):
         """Test that reports are ordered by created_at descending."""
-        csv_content = b'col1,col2,target\n1,2,0'
-        file = SimpleUploadedFile('test.csv', csv_content, content_type='text/csv')
-
-        dataset = Dataset.objects.create(
-            owner=user,
-            name='Test',
-            file=file,
-            original_filename='test.csv',
-            file_type='csv',
-            file_size=len(csv_content),
-        )
-
         report1 = Report.objects.create(owner=user, dataset=dataset, title='Report 1')
         report2 = Report.objects.create(owner=user, dataset=dataset, title='Report 2')
         report3 = Report.objects.create(owner=user, dataset=dataset, title='Report 3')
@@ -270,20 +161,8 @@ class TestReportModel:
         assert reports[1].title == 'Report 2'
         assert reports[2].title == 'Report 1'
 
-    def test_report_string_representation(self, user):
+    def test_report_string_representation(self, user, dataset):
         """Test report string representation."""
-        csv_content = b'col1,col2,target\n1,2,0'
-        file = SimpleUploadedFile('test.csv', csv_content, content_type='text/csv')
-
-        dataset = Dataset.objects.create(
-            owner=user,
-            name='Test',
-            file=file,
-            original_filename='test.csv',
-            file_type='csv',
-            file_size=len(csv_content),
-        )
-
         report = Report.objects.create(
             owner=user,
             dataset=dataset,
@@ -292,3 +171,25 @@ class TestReportModel:
         )
 
         assert 'My Report' in str(report)
+
+    def test_share_token_unique_only_when_set(self, dataset):
+        """Test unshared reports may all lack a token but tokens can't repeat."""
+        for _ in range(2):
+            Report.objects.create(owner=dataset.owner, dataset=dataset, title='Unshared')
+
+        Report.objects.create(
+            owner=dataset.owner, dataset=dataset, title='Shared', share_token='token'
+        )
+        with pytest.raises(IntegrityError), transaction.atomic():
+            Report.objects.create(
+                owner=dataset.owner, dataset=dataset, title='Copy', share_token='token'
+            )
+
+    def test_generate_share_token_is_stable(self, dataset):
+        """Test a report keeps its first share token."""
+        report = Report.objects.create(owner=dataset.owner, dataset=dataset, title='Shared')
+
+        token = report.generate_share_token()
+
+        assert len(token) == 43
+        assert report.generate_share_token() == token
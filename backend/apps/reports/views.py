@@ -152,7 +152,7 @@ class ReportViewSet(ReadOnlyModelViewSet):
             # Generate share token if not exists
             report.generate_share_token()
             report.is_public = True
-            report.save()
+            report.save(update_fields=['share_token', 'is_public', 'updated_at'])
 
             logger.info(f'Report {report.id} shared by user {request.user.email}')
 
@@ -165,7 +165,7 @@ class ReportViewSet(ReadOnlyModelViewSet):
         else:
             # Disable sharing (keep token for potential re-enable)
             report.is_public = False
-            report.save()
+            report.save(update_fields=['is_public', 'updated_at'])
 
             logger.info(f'Report {report.id} unshared by user {request.user.email}')
 
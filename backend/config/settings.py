@@ -143,6 +143,10 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = config('MEDIA_ROOT', default=str(BASE_DIR / 'media'))
 
+# Internal nginx location aliased to MEDIA_ROOT. When set, file downloads are
+# handed to nginx with X-Accel-Redirect instead of streamed by Django.
+MEDIA_ACCEL_REDIRECT_PREFIX = config('MEDIA_ACCEL_REDIRECT_PREFIX', default='')
+
 # =============================================================================
 # DEFAULT PRIMARY KEY FIELD TYPE
 # =============================================================================
@@ -249,6 +253,16 @@ EDA_SAMPLE_SIZE = 10000
 # Model storage path
 MODEL_STORAGE_PATH = os.path.join(MEDIA_ROOT, 'models')
 
+# On-disk cache of fitted preprocessors and CV scores, reused across re-runs.
+# It holds users' preprocessed training data, so it must stay outside
+# MEDIA_ROOT, which is served over HTTP
+ML_CACHE_DIR = config('ML_CACHE_DIR', default=str(BASE_DIR / 'ml_cache'))
+ML_CACHE_BYTES_LIMIT = config('ML_CACHE_BYTES_LIMIT', default=2**30, cast=int)
+
+# Seconds a synchronous training request waits for the Celery worker before
+# answering 202; keep below the gunicorn worker timeout
+ML_SYNC_TRAINING_TIMEOUT = config('ML_SYNC_TRAINING_TIMEOUT', default=100, cast=int)
+
 # =============================================================================
 # LOGGING
 # =============================================================================
@@ -298,6 +312,21 @@ LOGGING = {
 # Create logs directory if it doesn't exist
 os.makedirs(BASE_DIR / 'logs', exist_ok=True)
 
+# =============================================================================
+# CACHE
+# =============================================================================
+
+# Shared Redis cache when configured; otherwise each process caches in memory
+REDIS_CACHE_URL = config('REDIS_CACHE_URL', default='')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_CACHE_URL,
+    } if REDIS_CACHE_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
 # =============================================================================
 # CELERY SETTINGS
 # =============================================================================
@@ -310,3 +339,13 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60  # 30 minutes
+
+# Long CPU-bound training gets its own queue so it can't hold up batch
+# predictions; everything else stays on the default 'celery' queue
+CELERY_TASK_ROUTES = {
+    'apps.ml.tasks.train_models_task': {'queue': 'training'},
+    'apps.predictions.tasks.run_batch_prediction_task': {'queue': 'predictions'},
+}
+# Reserve one task at a time, so a queued training job waits for a free
+# worker rather than behind a busy one
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
@@ -10,9 +10,45 @@ import pytest
 from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework.test import APIClient
 
+from apps.datasets.models import Dataset
+from apps.ml.models import TrainingJob
 from apps.users.models import User
 
 
+@pytest.fixture(scope='session')
+def django_db_modify_db_settings(django_db_modify_db_settings_parallel_suffix):
+    """Don't wait for WAL flushes on commit; test databases are disposable."""
+    from django.conf import settings
+
+    options = settings.DATABASES['default'].setdefault('OPTIONS', {})
+    options['options'] = f"{options.get('options', '')} -c synchronous_commit=off".strip()
+
+
+@pytest.fixture(scope='session')
+def media_root(tmp_path_factory):
+    """Temporary media directory shared by the whole test session."""
+    return tmp_path_factory.mktemp('media')
+
+
+@pytest.fixture(autouse=True)
+def _test_settings(settings, media_root):
+    """Apply settings that keep tests fast and off the real media directory."""
+    settings.MEDIA_ROOT = str(media_root)
+    settings.ML_CACHE_DIR = str(media_root.parent / 'ml_cache')
+    # Creating a user with the default PBKDF2 hasher costs far more than
+    # the rest of a typical test
+    settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+@pytest.fixture
+def in_memory_storage(settings):
+    """Keep uploaded files in memory, for tests that never read them from disk."""
+    settings.STORAGES = {
+        **settings.STORAGES,
+        'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+    }
+
+
 @pytest.fixture
 def api_client():
     """Return an unauthenticated API client."""
@@ -46,6 +82,28 @@ def authenticated_client(api_client, user):
     return api_client
 
 
+@pytest.fixture
+def dataset(user):
+    """Create and return a file-less dataset owned by the test user."""
+    return Dataset.objects.create(
+        owner=user,
+        name='Test',
+        original_filename='test.csv',
+        file_type='csv',
+        file_size=0,
+    )
+
+
+@pytest.fixture
+def training_job(dataset):
+    """Create and return a pending training job on the test dataset."""
+    return TrainingJob.objects.create(
+        dataset=dataset,
+        owner=dataset.owner,
+        target_column='target',
+    )
+
+
 @pytest.fixture
 def sample_csv_file():
     """Create a sample CSV file for testing."""
@@ -93,7 +93,8 @@ case "$1" in
     "worker")
         wait_for_db
         echo -e "${GREEN}Starting Celery worker...${NC}"
-        exec celery -A config worker -l ${CELERY_LOG_LEVEL:-INFO} --concurrency=${CELERY_CONCURRENCY:-2}
+        exec celery -A config worker -l ${CELERY_LOG_LEVEL:-INFO} --concurrency=${CELERY_CONCURRENCY:-2} \
+            -Q ${CELERY_QUEUES:-celery,training,predictions}
         ;;
     "beat")
         wait_for_db
@@ -3,11 +3,19 @@ import { apiClient } from "./client";
 export interface PredictionJob {
   id: string;
   model: string;
-  status: "pending" | "processing" | "completed" | "failed";
-  input_file: string;
-  output_file?: string;
+  status: "pending" | "running" | "completed" | "error";
+  input_type: "json" | "file";
+  input_row_count: number;
   error_message?: string;
   created_at: string;
+  completed_at?: string | null;
+}
+
+// Batch predictions are queued; poll getJob with the returned id
+export interface QueuedPredictionJob {
+  job_id: string;
+  status: PredictionJob["status"];
+  message: string;
 }
 
 export const predictionsApi = {
@@ -50,7 +58,7 @@ export const predictionsApi = {
     formData.append("model_id", modelId);
     formData.append("file", file);
     return apiClient
-      .post<PredictionJob>("/predictions/batch/", formData, {
+      .post<QueuedPredictionJob>("/predictions/batch/", formData, {
         headers: { "Content-Type": "multipart/form-data" },
       })
       .then((res) => res.data);
@@ -62,6 +70,12 @@ export const predictionsApi = {
       .then((res) => res.data);
   },
 
+  download: (id: string) => {
+    return apiClient.get<Blob>(`/predictions/jobs/${id}/download/`, {
+      responseType: "blob",
+    });
+  },
+
   listJobs: (modelId?: string) => {
     const url = modelId
       ? `/predictions/jobs/?model=${modelId}`
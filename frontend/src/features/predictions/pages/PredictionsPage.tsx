@@ -2,6 +2,7 @@ import React, { useState } from "react";
 import { useSearchParams, Link } from "react-router-dom";
 import { useQuery } from "@tanstack/react-query";
 import { apiClient } from "../../../api/client";
+import { predictionsApi } from "../../../api/predictions";
 import { Button } from "../../../components/ui/button";
 import {
   Layers,
@@ -28,10 +29,8 @@ export const PredictionsPage: React.FC = () => {
   const modelId = searchParams.get("modelId");
   const [file, setFile] = useState<File | null>(null);
   const [isPredicting, setIsPredicting] = useState(false);
-  const [predictionResult, setPredictionResult] = useState<{
-    row_count?: number;
-    download_url?: string;
-  } | null>(null);
+  const [isDownloading, setIsDownloading] = useState(false);
+  const [jobId, setJobId] = useState<string | null>(null);
   const [error, setError] = useState<string | null>(null);
 
   const { data: model } = useQuery({
@@ -44,6 +43,19 @@ export const PredictionsPage: React.FC = () => {
     enabled: !!modelId,
   });
 
+  // Batch jobs run on a worker; poll until the job finishes
+  const { data: job } = useQuery({
+    queryKey: ["prediction-job", jobId],
+    queryFn: () => predictionsApi.getJob(jobId!),
+    enabled: !!jobId,
+    refetchInterval: (query) => {
+      const status = query.state.data?.status;
+      return !status || status === "pending" || status === "running"
+        ? 2000
+        : false;
+    },
+  });
+
   const handleFileChange = (e: React.ChangeEvent<HTMLInputElement>) => {
     const selectedFile = e.target.files?.[0];
     if (selectedFile) {
@@ -58,17 +70,9 @@ export const PredictionsPage: React.FC = () => {
     setIsPredicting(true);
     setError(null);
 
-    const formData = new FormData();
-    formData.append("file", file);
-    formData.append("model_id", modelId);
-
     try {
-      const response = await apiClient.post("/predictions/batch/", formData, {
-        headers: {
-          "Content-Type": "multipart/form-data",
-        },
-      });
-      setPredictionResult(response.data);
+      const queued = await predictionsApi.batchPredict(modelId, file);
+      setJobId(queued.job_id);
     } catch (err: unknown) {
       const error = err as { response?: { data?: { detail?: string } } };
       setError(
@@ -80,6 +84,31 @@ export const PredictionsPage: React.FC = () => {
     }
   };
 
+  const handleDownload = async () => {
+    if (!jobId) return;
+
+    setIsDownloading(true);
+    try {
+      const response = await predictionsApi.download(jobId);
+      const url = URL.createObjectURL(response.data);
+      const link = document.createElement("a");
+      link.href = url;
+      link.download = `predictions_${jobId}.csv`;
+      link.click();
+      URL.revokeObjectURL(url);
+    } catch {
+      setError("Failed to download predictions.");
+    } finally {
+      setIsDownloading(false);
+    }
+  };
+
+  const handleReset = () => {
+    setJobId(null);
+    setFile(null);
+    setError(null);
+  };
+
   if (!modelId) {
     return (
       <div className="flex flex-col items-center justify-center h-[60vh] text-center">
@@ -124,7 +153,7 @@ export const PredictionsPage: React.FC = () => {
         )}
       </div>
 
-      {!predictionResult ? (
+      {!jobId ? (
         <motion.div variants={listItemVariants} className="space-y-8">
           <Card className="border-none shadow-sm bg-primary/5 dark:bg-primary/10 border-primary/10">
             <CardContent className="pt-6">
@@ -230,6 +259,47 @@ export const PredictionsPage: React.FC = () => {
             </CardContent>
           </Card>
         </motion.div>
+      ) : job?.status === "error" ? (
+        <motion.div variants={listItemVariants} className="space-y-8">
+          <Card className="border-none shadow-sm bg-destructive/5 border-destructive/20">
+            <CardContent className="pt-12 pb-12 text-center">
+              <div className="h-20 w-20 bg-destructive/10 rounded-full flex items-center justify-center mx-auto mb-6">
+                <AlertCircle className="h-10 w-10 text-destructive" />
+              </div>
+              <h3 className="text-2xl font-bold text-foreground">
+                Predictions Failed
+              </h3>
+              <p className="text-muted-foreground mt-2 max-w-md mx-auto">
+                {job.error_message ||
+                  "Failed to process predictions. Please check your file schema."}
+              </p>
+              <div className="mt-10 flex justify-center">
+                <Button size="lg" variant="outline" onClick={handleReset}>
+                  Try Another File
+                </Button>
+              </div>
+            </CardContent>
+          </Card>
+        </motion.div>
+      ) : job?.status !== "completed" ? (
+        <motion.div variants={listItemVariants} className="space-y-8">
+          <Card className="border-none shadow-sm">
+            <CardContent className="pt-12 pb-12 text-center">
+              <div className="h-20 w-20 bg-primary/10 rounded-full flex items-center justify-center mx-auto mb-6">
+                <Loader2 className="h-10 w-10 text-primary animate-spin" />
+              </div>
+              <h3 className="text-2xl font-bold text-foreground">
+                {job?.status === "running"
+                  ? "Running Predictions"
+                  : "Predictions Queued"}
+              </h3>
+              <p className="text-muted-foreground mt-2 max-w-md mx-auto">
+                Your file is being processed in the background. This page
+                updates when the results are ready.
+              </p>
+            </CardContent>
+          </Card>
+        </motion.div>
       ) : (
         <motion.div variants={listItemVariants} className="space-y-8">
           <Card className="border-none shadow-sm bg-emerald-50 dark:bg-emerald-950/20 border-emerald-100 dark:border-emerald-900/30">
@@ -242,27 +312,37 @@ export const PredictionsPage: React.FC = () => {
               </h3>
               <p className="text-emerald-700 dark:text-emerald-400 mt-2 max-w-md mx-auto">
                 Successfully processed{" "}
-                <span className="font-bold">{predictionResult.row_count}</span>{" "}
+                <span className="font-bold">{job.input_row_count}</span>{" "}
                 rows. Your results are ready for download.
               </p>
               <div className="mt-10 flex flex-col sm:flex-row justify-center gap-4">
                 <Button
                   size="lg"
                   className="shadow-lg bg-emerald-600 hover:bg-emerald-700 text-white border-none"
-                  onClick={() => window.open(predictionResult.download_url)}
+                  onClick={handleDownload}
+                  disabled={isDownloading}
                 >
-                  <Download className="mr-2 h-5 w-5" />
+                  {isDownloading ? (
+                    <Loader2 className="mr-2 h-5 w-5 animate-spin" />
+                  ) : (
+                    <Download className="mr-2 h-5 w-5" />
+                  )}
                   Download Results (CSV)
                 </Button>
                 <Button
                   size="lg"
                   variant="outline"
                   className="bg-background/50"
-                  onClick={() => setPredictionResult(null)}
+                  onClick={handleReset}
                 >
                   Run Another Batch
                 </Button>
               </div>
+              {error && (
+                <p className="mt-6 text-sm font-medium text-destructive">
+                  {error}
+                </p>
+              )}
             </CardContent>
           </Card>
 